@@ -1,20 +1,34 @@
-from bson import ObjectId
-from flask import Flask, jsonify
+import click
+from flask import Flask, jsonify, request
 from marshmallow import ValidationError
-from extensions import mongo, jwt
+from config import Config
+from data_access import read_store
+from extensions import mongo, jwt, review_buffer, company_cache, accomplishment_cache
 from routes.companies import companies_bp
 from routes.review import reviews_bp
 from routes.accomplishments import accomplishments_bp
 from routes.user import users_bp
+from models import company_cube, company_similarity, company_sketch, review_storage
 
 app = Flask(__name__)
 
 # Configuration
-app.config["MONGO_URI"] = "mongodb://localhost:27017/famous_companies_db"
-app.config["SECRET_KEY"] = "your_secret_key"
-app.config["JWT_SECRET_KEY"] = "your_jwt_secret_key"
+app.config.from_object(Config)
+if app.config["DATA_BACKEND"] == "snapshot":
+    # The snapshot is immutable and there is no MongoDB to keep the caches coherent with
+    app.config["CACHE_ENABLED"] = False
 mongo.init_app(app)
 jwt.init_app(app)
+review_buffer.init_app(app)
+company_cache.init_app(app)
+accomplishment_cache.init_app(app)
+read_store.init_app(app)
+
+# Keep the per-company review sketches current, once per stored batch of reviews
+review_buffer.on_flush(company_sketch.apply_reviews)
+review_buffer.on_flush(company_cube.apply_reviews)
+# Keep the review metrics and the embedded latest reviews of the companies current
+review_buffer.on_flush(review_storage.apply_reviews)
 
 # Error Handlers
 @app.errorhandler(ValidationError)
@@ -32,6 +46,12 @@ def internal_error(error):
     """Handles server errors and returns a JSON response."""
     return jsonify({"error": "An internal error occurred"}), 500
 
+@app.before_request
+def reject_writes_on_snapshot():
+    """Rejects write requests when the API is served from a read-only snapshot."""
+    if read_store.read_only and request.method not in ("GET", "HEAD", "OPTIONS"):
+        return jsonify({"error": "This deployment serves a read-only snapshot"}), 405
+
 # Register Blueprints for Different Routes
 app.register_blueprint(companies_bp, url_prefix='/api')
 app.register_blueprint(reviews_bp, url_prefix='/api')
@@ -42,40 +62,8 @@ app.register_blueprint(users_bp, url_prefix='/api/users')
 # Retrieves the top 5 rated companies by calculating the average rating.
 @app.route('/companies/top-rated', methods=['GET'])
 def get_top_rated_companies():
-    pipeline = [
-        {
-            "$lookup": {
-                "from": "reviews",
-                "localField": "_id",
-                "foreignField": "company_id",
-                "as": "reviews"
-            }
-        },
-        {
-            "$addFields": {
-                "averageRating": {"$avg": "$reviews.rating"}
-            }
-        },
-        {
-            "$sort": {"averageRating": -1}
-        },
-        {
-            "$limit": 5
-        },
-        {
-            "$project": {
-                "name": 1,
-                "averageRating": 1
-            }
-        }
-    ]
     try:
-        result = list(mongo.db.companies.aggregate(pipeline))
-        
-        # Convert ObjectIds to strings for JSON response
-        for company in result:
-            company["_id"] = str(company["_id"])
-            
+        result = read_store.top_rated_companies(5)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
     
@@ -86,20 +74,10 @@ def get_top_rated_companies():
 @app.route('/companies/<company_id>/average-rating', methods=['GET'])
 def get_average_rating(company_id):
     try:
-        pipeline = [
-            {"$match": {"company_id": ObjectId(company_id)}},  # Match reviews for this company
-            {"$group": {
-                "_id": "$company_id",
-                "averageRating": {"$avg": "$rating"}
-            }}
-        ]
-        result = list(mongo.db.reviews.aggregate(pipeline))
+        result = read_store.average_rating(company_id)
         
         if result:
-            # Convert ObjectId to string
-            result[0]["_id"] = str(result[0]["_id"])
-            result[0]["averageRating"] = round(result[0]["averageRating"], 2)  # Round for readability
-            return jsonify(result[0])
+            return jsonify(result)
         else:
             return jsonify({"message": "No reviews found for this company"}), 404
     except Exception as e:
@@ -109,33 +87,8 @@ def get_average_rating(company_id):
 # Retrieves the review counts for each company, sorted by review count.
 @app.route('/companies/review-counts', methods=['GET'])
 def get_review_counts():
-    pipeline = [
-        {
-            "$lookup": {
-                "from": "reviews",
-                "localField": "_id",
-                "foreignField": "company_id",
-                "as": "reviews"
-            }
-        },
-        {
-            "$project": {
-                "name": 1,
-                "reviewCount": {"$size": "$reviews"}
-            }
-        },
-        {
-            "$sort": {"reviewCount": -1}
-        }
-    ]
-
     try:
-        result = list(mongo.db.companies.aggregate(pipeline))
-        
-        # Convert ObjectId to string for each company in the result
-        for company in result:
-            company["_id"] = str(company["_id"])
-        
+        result = read_store.review_counts()
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -146,21 +99,7 @@ def get_review_counts():
 @app.route('/companies/<company_id>/rating-distribution', methods=['GET'])
 def get_rating_distribution(company_id):
     try:
-        pipeline = [
-            {
-                "$addFields": {
-                    "company_id": {"$convert": {"input": "$company_id", "to": "objectId", "onError": None}}
-                }
-            },
-            {"$match": {"company_id": ObjectId(company_id)}},
-            {"$group": {
-                "_id": "$rating",
-                "count": {"$sum": 1}
-            }},
-            {"$sort": {"_id": 1}}
-        ]
-        
-        distribution = list(mongo.db.reviews.aggregate(pipeline))
+        distribution = read_store.rating_distribution(company_id)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
     
@@ -169,54 +108,8 @@ def get_rating_distribution(company_id):
 # Lists companies by engagement based on review and accomplishment counts.
 @app.route('/companies/engagement', methods=['GET'])
 def get_company_engagement():
-    pipeline = [
-        {
-            "$lookup": {
-                "from": "reviews",
-                "let": {"companyId": "$_id"},
-                "pipeline": [
-                    {
-                        "$addFields": {
-                            "company_id": {"$convert": {"input": "$company_id", "to": "objectId", "onError": None}}
-                        }
-                    },
-                    {"$match": {"$expr": {"$eq": ["$company_id", "$$companyId"]}}}
-                ],
-                "as": "reviews"
-            }
-        },
-        {
-            "$lookup": {
-                "from": "accomplishments",
-                "let": {"companyId": "$_id"},
-                "pipeline": [
-                    {
-                        "$addFields": {
-                            "company_id": {"$convert": {"input": "$company_id", "to": "objectId", "onError": None}}
-                        }
-                    },
-                    {"$match": {"$expr": {"$eq": ["$company_id", "$$companyId"]}}}
-                ],
-                "as": "accomplishments"
-            }
-        },
-        {
-            "$project": {
-                "name": 1,
-                "reviewCount": {"$size": "$reviews"},
-                "accomplishmentCount": {"$size": "$accomplishments"}
-            }
-        },
-        {"$sort": {"reviewCount": -1, "accomplishmentCount": -1}}
-    ]
-
     try:
-        engagement = list(mongo.db.companies.aggregate(pipeline))
-        
-        # Convert ObjectId to string for each document in the engagement list
-        for company in engagement:
-            company["_id"] = str(company["_id"])
-            
+        engagement = read_store.company_engagement()
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -226,23 +119,163 @@ def get_company_engagement():
 @app.route('/companies/<company_id>/top-accomplishments', methods=['GET'])
 def get_top_accomplishments(company_id):
     try:
-        pipeline = [
-            {"$match": {"company_id": ObjectId(company_id)}},  # Convert to ObjectId for matching
-            {"$sort": {"achievement_score": -1}},  # Sort by achievement score
-            {"$limit": 5}
-        ]
-        accomplishments = list(mongo.db.accomplishments.aggregate(pipeline))
-        
-        # Convert ObjectIds to strings if needed
-        for accomplishment in accomplishments:
-            accomplishment["_id"] = str(accomplishment["_id"])
-            accomplishment["company_id"] = str(accomplishment["company_id"])
-        
+        accomplishments = read_store.top_accomplishments(company_id, 5)
         return jsonify(accomplishments)
     
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+# Estimates the number of distinct reviewers of a company from its HyperLogLog sketch.
+@app.route('/companies/<company_id>/distinct-reviewers', methods=['GET'])
+def get_distinct_reviewers(company_id):
+    try:
+        reviewers, _, found = read_store.review_sketches([company_id])
+        if not found:
+            return jsonify({"message": "No reviews found for this company"}), 404
+        return jsonify({
+            "_id": company_id,
+            "distinctReviewers": reviewers.count(),
+            "relativeError": round(reviewers.relative_error, 4)
+        })
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+# Returns the median and p10/p90 ratings of a company from its rating histogram.
+@app.route('/companies/<company_id>/rating-percentiles', methods=['GET'])
+def get_rating_percentiles(company_id):
+    try:
+        _, ratings, found = read_store.review_sketches([company_id])
+        if not found or not ratings.total:
+            return jsonify({"message": "No reviews found for this company"}), 404
+        return jsonify({
+            "_id": company_id,
+            "reviewCount": ratings.total,
+            "p10": ratings.quantile(0.1),
+            "median": ratings.quantile(0.5),
+            "p90": ratings.quantile(0.9),
+            "maxError": ratings.max_error
+        })
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+# Merges the sketches of every company in an industry into one reviewer and rating summary.
+@app.route('/industries/<industry>/review-summary', methods=['GET'])
+def get_industry_review_summary(industry):
+    try:
+        company_ids = read_store.company_ids_in_industry(industry)
+        reviewers, ratings, found = read_store.review_sketches(company_ids)
+        if not found or not ratings.total:
+            return jsonify({"message": "No reviews found for this industry"}), 404
+        return jsonify({
+            "industry": industry,
+            "companyCount": found,
+            "reviewCount": ratings.total,
+            "distinctReviewers": reviewers.count(),
+            "distinctReviewersRelativeError": round(reviewers.relative_error, 4),
+            "p10": ratings.quantile(0.1),
+            "median": ratings.quantile(0.5),
+            "p90": ratings.quantile(0.9),
+            "ratingMaxError": ratings.max_error
+        })
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+# Slices average rating, review volume and accomplishment score by industry, location and founded decade.
+# ?dimensions=industry,decade rolls the cube up to those dimensions; ?industry=Finance&decade=2000 drills down.
+@app.route('/analytics/cube', methods=['GET'])
+def get_analytics_cube():
+    dimensions = [dimension for dimension in request.args.get("dimensions", "").split(",") if dimension]
+    unknown = [dimension for dimension in dimensions if dimension not in company_cube.DIMENSIONS]
+    if unknown:
+        return jsonify({"error": f"Unknown dimensions: {', '.join(unknown)}"}), 400
+
+    filters = {}
+    for dimension in company_cube.DIMENSIONS:
+        if dimension in request.args:
+            filters[dimension] = request.args[dimension]
+    try:
+        if "decade" in filters:
+            filters["decade"] = int(filters["decade"])
+    except ValueError:
+        return jsonify({"error": "decade must be a year such as 1990"}), 400
+
+    try:
+        return jsonify(read_store.cube(dimensions, filters))
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+# Reports hit and miss rates of this worker's document caches.
+@app.route('/cache/stats', methods=['GET'])
+def get_cache_stats():
+    return jsonify({
+        "companies": company_cache.stats(),
+        "accomplishments": accomplishment_cache.stats()
+    })
+
+# Rebuilds the review sketches from the reviews collection: `flask --app app rebuild-sketches`
+@app.cli.command("rebuild-sketches")
+def rebuild_sketches_command():
+    count = company_sketch.rebuild_sketches()
+    print(f"Rebuilt review sketches for {count} companies.")
+
+# Rebuilds the analytics cube from the raw collections: `flask --app app rebuild-cube`
+@app.cli.command("rebuild-cube")
+def rebuild_cube_command():
+    count = company_cube.rebuild_cube()
+    print(f"Rebuilt analytics cube with {count} cells.")
+
+# Recomputes the "similar companies" lists: `flask --app app refresh-similar [--full] [--k 20]`
+@app.cli.command("refresh-similar")
+@click.option("--full", is_flag=True, help="Recompute every company instead of only those affected by new reviews.")
+@click.option("--k", default=20, show_default=True, help="Number of neighbours to keep per company.")
+@click.option("--chunk-size", default=50000, show_default=True, help="Number of reviews read per chunk.")
+def refresh_similar_command(full, k, chunk_size):
+    count = company_similarity.refresh_similar_companies(k=k, full=full, chunk_size=chunk_size)
+    print(f"Refreshed similar companies for {count} companies.")
+
+# Repairs the review metrics and embedded company summaries from the reviews collection:
+# `flask --app app rebuild-review-metrics`
+@app.cli.command("rebuild-review-metrics")
+@click.option("--batch-size", default=1000, show_default=True, help="Number of documents read and written per round trip.")
+def rebuild_review_metrics_command(batch_size):
+    written, deleted = review_storage.rebuild_review_metrics(batch_size=batch_size)
+    print(f"Rewrote metrics of {written} reviews, deleted {deleted} orphaned metrics.")
+
+# Converts reviews to compact storage and reports storage before and after:
+# `flask --app app migrate-review-storage [--latest 5] [--no-recompress]`
+@app.cli.command("migrate-review-storage")
+@click.option("--latest", type=int, default=None, help="Reviews embedded per company (default: COMPANY_LATEST_REVIEWS, 0 removes them).")
+@click.option("--recompress/--no-recompress", default=True, show_default=True, help="Also rewrite 'reviews' with block compression.")
+@click.option("--batch-size", default=1000, show_default=True, help="Number of documents copied per round trip.")
+def migrate_review_storage_command(latest, recompress, batch_size):
+    if latest is None:
+        latest = app.config["COMPANY_LATEST_REVIEWS"]
+    before, after = review_storage.migrate_review_storage(
+        latest=latest,
+        compressor=app.config["COLLECTION_BLOCK_COMPRESSOR"],
+        recompress=recompress,
+        batch_size=batch_size
+    )
+    print(f"{'collection':<16}{'':>8}{'documents':>12}{'data':>14}{'on disk':>14}{'indexes':>14}{'footprint':>14}  compressor")
+    for name in review_storage.REPORTED_COLLECTIONS:
+        for label, report in (("before", before), ("after", after)):
+            stats = report["collections"][name]
+            if stats is None:
+                print(f"{name:<16}{label:>8}{'-':>12}")
+                continue
+            print(
+                f"{name:<16}{label:>8}{stats['count']:>12}{stats['size']:>14}{stats['storageSize']:>14}"
+                f"{stats['totalIndexSize']:>14}{stats['footprint']:>14}  {stats['compressor'] or '-'}"
+            )
+    for mode in review_storage.WORKING_SETS:
+        sizes = [report["working_sets"][mode] for report in (before, after)]
+        print(f"Working set ({mode}): " + " -> ".join("-" if size is None else f"{size} bytes" for size in sizes))
+    print(f"Set REVIEW_STORAGE_MODE=compact and COMPANY_LATEST_REVIEWS={latest} to serve from the migrated data.")
+
 # Run the application
 if __name__ == "__main__":
     app.run(debug=True)
@@ -0,0 +1,178 @@
+import threading
+import time
+from collections import OrderedDict
+from pymongo import ReturnDocument
+
+
+class DocumentCache:
+    """
+    Size-bounded in-process LRU cache for rarely changing documents.
+
+    Every worker process keeps its own cache. Writes call `invalidate`, which drops the local
+    entry and bumps a version counter stored in the `cache_versions` collection. Other workers
+    compare that counter at most every CACHE_VERSION_POLL_MS milliseconds and clear their cache
+    when it has moved. Entries also expire after CACHE_MAX_STALENESS_SECONDS, so a worker never
+    serves a stale document for longer than that bound, even for writes made outside the API.
+    """
+
+    def __init__(self, mongo, namespace, app=None):
+        self.mongo = mongo
+        self.namespace = namespace
+        self.max_size = 1024
+        self.max_staleness = 5.0
+        self.poll_interval = 1.0
+        self.enabled = True
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = None
+        self._checked_at = 0.0
+        self.hits = 0
+        self.misses = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """
+        Reads the cache settings from the application config.
+
+        Args:
+            app (Flask): The application whose config the cache uses.
+        """
+        app.config.setdefault("CACHE_ENABLED", True)
+        app.config.setdefault("CACHE_MAX_ENTRIES", 1024)
+        app.config.setdefault("CACHE_MAX_STALENESS_SECONDS", 5.0)
+        app.config.setdefault("CACHE_VERSION_POLL_MS", 1000)
+
+        self.enabled = bool(app.config["CACHE_ENABLED"])
+        self.max_size = max(1, int(app.config["CACHE_MAX_ENTRIES"]))
+        self.max_staleness = float(app.config["CACHE_MAX_STALENESS_SECONDS"])
+        # Polling less often than the staleness bound would break the bound
+        self.poll_interval = min(app.config["CACHE_VERSION_POLL_MS"] / 1000.0, self.max_staleness)
+        self.clear()
+
+    def get(self, key, loader):
+        """
+        Returns the cached value for `key`, calling `loader` on a miss.
+
+        Args:
+            key (hashable): The cache key, usually the document ID as a string.
+            loader (callable): Function returning the value when it is not cached. A `None`
+                               result (document not found) is not cached.
+
+        Returns:
+            The cached or freshly loaded value.
+        """
+        if not self.enabled:
+            return loader()
+
+        self._check_version()
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            version = self._version
+
+        value = loader()
+        if value is not None:
+            with self._lock:
+                # Skip the store if an invalidation happened while the loader was running
+                if version == self._version:
+                    self._entries[key] = (now + self.max_staleness, value)
+                    self._entries.move_to_end(key)
+                    while len(self._entries) > self.max_size:
+                        self._entries.popitem(last=False)
+        return value
+
+    def invalidate(self, key=None):
+        """
+        Drops `key` (or every entry when no key is given) in this worker and signals other workers.
+
+        Args:
+            key (hashable, optional): The cache key to drop.
+        """
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+        try:
+            result = self.mongo.db.cache_versions.find_one_and_update(
+                {"_id": self.namespace},
+                {"$inc": {"version": 1}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+            with self._lock:
+                # Another worker bumped the version in between, so its invalidation applies here too
+                if self._version is None or result["version"] != self._version + 1:
+                    self._entries.clear()
+                self._version = result["version"]
+                self._checked_at = time.monotonic()
+        except Exception:
+            # Without the version bump other workers still expire the entry after max_staleness
+            with self._lock:
+                self._version = None
+
+    def discard(self, key):
+        """
+        Drops `key` in this worker only, without signalling other workers.
+
+        For frequent writes whose effect may reach other workers late: their entries still expire
+        after max_staleness, and their other entries are not wiped by a version bump.
+
+        Args:
+            key (hashable): The cache key to drop.
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """
+        Drops every entry in this worker and resets the statistics.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._version = None
+            self._checked_at = 0.0
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """
+        Returns hit and miss counters for this worker.
+
+        Returns:
+            dict: Entry count, hits, misses and hit rate.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "namespace": self.namespace,
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "max_entries": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "max_staleness_seconds": self.max_staleness
+            }
+
+    def _check_version(self):
+        now = time.monotonic()
+        if now - self._checked_at < self.poll_interval:
+            return
+        try:
+            document = self.mongo.db.cache_versions.find_one({"_id": self.namespace})
+            version = document["version"] if document else 0
+        except Exception:
+            # Fail closed: without a version we cannot prove the entries are current
+            version = None
+        with self._lock:
+            if version is None or version != self._version:
+                self._entries.clear()
+            self._version = version
+            self._checked_at = now
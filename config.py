@@ -5,8 +5,42 @@ class Config:
     Base configuration with common settings.
     """
     MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/famous_companies_db")
+    SECRET_KEY = os.getenv("SECRET_KEY", "your_secret_key")
     JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY", "alekss13022002")
 
+    # Review ingestion: "strict" inserts each review synchronously, "write_behind" buffers and batches them
+    REVIEW_WRITE_MODE = os.getenv("REVIEW_WRITE_MODE", "strict")
+    REVIEW_FLUSH_INTERVAL_MS = int(os.getenv("REVIEW_FLUSH_INTERVAL_MS", "200"))
+    REVIEW_FLUSH_BATCH_SIZE = int(os.getenv("REVIEW_FLUSH_BATCH_SIZE", "500"))
+    REVIEW_BUFFER_MAX_DOCS = int(os.getenv("REVIEW_BUFFER_MAX_DOCS", "10000"))
+
+    # Review storage: "compact" answers rating analytics from the lean 'review_metrics' collection
+    # (convert existing data first with `flask --app app migrate-review-storage`)
+    REVIEW_STORAGE_MODE = os.getenv("REVIEW_STORAGE_MODE", "classic")
+    # Number of newest reviews embedded in each company document; 0 disables the summary
+    COMPANY_LATEST_REVIEWS = int(os.getenv("COMPANY_LATEST_REVIEWS", "0"))
+    COLLECTION_BLOCK_COMPRESSOR = os.getenv("COLLECTION_BLOCK_COMPRESSOR", "zstd")
+
+    # In-process document cache for companies and accomplishments, kept coherent across workers
+    CACHE_ENABLED = os.getenv("CACHE_ENABLED", "true").lower() == "true"
+    CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "1024"))
+    CACHE_MAX_STALENESS_SECONDS = float(os.getenv("CACHE_MAX_STALENESS_SECONDS", "5"))
+    CACHE_VERSION_POLL_MS = int(os.getenv("CACHE_VERSION_POLL_MS", "1000"))
+
+    # Per-worker connection pool and startup warmup used by the production entry point (wsgi.py)
+    MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "100"))
+    MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "4"))
+    WARMUP_CONNECTIONS = int(os.getenv("WARMUP_CONNECTIONS", "4"))
+    WARMUP_INDEX_TOUCH_LIMIT = int(os.getenv("WARMUP_INDEX_TOUCH_LIMIT", "10000"))
+    # Upper bound of a worker's warmup; keep it well below gunicorn's worker timeout (30 s)
+    WARMUP_TIMEOUT_MS = int(os.getenv("WARMUP_TIMEOUT_MS", "10000"))
+    WARMUP_PATHS = [path for path in os.getenv("WARMUP_PATHS", "/cache/stats").split(",") if path]
+
+    # Read backend: "mongo", or "snapshot" to serve the read API from JSON/NDJSON exports without MongoDB
+    DATA_BACKEND = os.getenv("DATA_BACKEND", "mongo")
+    SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", os.path.dirname(os.path.abspath(__file__)))
+    SNAPSHOT_CACHE_DIR = os.getenv("SNAPSHOT_CACHE_DIR")
+
 
 class DevelopmentConfig(Config):
     """
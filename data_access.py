@@ -0,0 +1,106 @@
+from models import company_cube, company_similarity, company_sketch
+from models.accomplishments import accomplishment_repository
+from models.company import company_repository
+from models.repository import to_object_id
+from models.review import review_repository
+from models.user import user_repository
+from utils import format_object_id
+
+
+class MongoReadStore:
+    """
+    Read operations of the API served from MongoDB through the repositories in models/.
+
+    Every method returns JSON-ready data (ObjectIds converted to strings), so the snapshot
+    engine (snapshot.SnapshotReadStore) can implement the same interface without MongoDB.
+    """
+
+    def list_companies(self):
+        return format_object_id(company_repository.list_all())
+
+    def get_company(self, company_id):
+        return format_object_id(company_repository.get_profile(company_id))
+
+    def list_reviews(self, company_id):
+        return format_object_id(review_repository.find_by_company(company_id))
+
+    def list_accomplishments(self, company_id):
+        return format_object_id(accomplishment_repository.find_by_company(company_id))
+
+    def get_user_profile(self, user_id):
+        return format_object_id(user_repository.get(user_id))
+
+    def similar_companies(self, company_id, limit):
+        return company_similarity.get_similar(to_object_id(company_id), limit)
+
+    def top_rated_companies(self, limit=5):
+        return format_object_id(company_repository.top_rated(limit))
+
+    def average_rating(self, company_id):
+        result = review_repository.average_rating(company_id)
+        if not result:
+            return None
+        result["averageRating"] = round(result["averageRating"], 2)  # Round for readability
+        return format_object_id(result)
+
+    def review_counts(self):
+        return format_object_id(company_repository.review_counts())
+
+    def rating_distribution(self, company_id):
+        return review_repository.rating_distribution(company_id)
+
+    def company_engagement(self):
+        return format_object_id(company_repository.engagement())
+
+    def top_accomplishments(self, company_id, limit=5):
+        return format_object_id(accomplishment_repository.top_for_company(company_id, limit))
+
+    def company_ids_in_industry(self, industry):
+        return [str(company_id) for company_id in company_repository.ids_in_industry(industry)]
+
+    def review_sketches(self, company_ids):
+        return company_sketch.get_sketches([to_object_id(company_id) for company_id in company_ids])
+
+    def cube(self, dimensions, filters):
+        return company_cube.query(dimensions, filters)
+
+
+class ReadStore:
+    """
+    Data-access interface used by the read routes.
+
+    Delegates to MongoReadStore, or to an in-memory snapshot when DATA_BACKEND is "snapshot".
+    """
+
+    def __init__(self, app=None):
+        self.backend = MongoReadStore()
+        self.read_only = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """
+        Selects the backend configured for the application.
+
+        Args:
+            app (Flask): The application whose config selects the backend.
+        """
+        app.config.setdefault("DATA_BACKEND", "mongo")
+        backend = app.config["DATA_BACKEND"]
+        if backend == "mongo":
+            self.backend = MongoReadStore()
+            self.read_only = False
+        elif backend == "snapshot":
+            from snapshot import Snapshot, SnapshotReadStore
+
+            snapshot = Snapshot.load(app.config["SNAPSHOT_DIR"], app.config.get("SNAPSHOT_CACHE_DIR"))
+            self.backend = SnapshotReadStore(snapshot)
+            self.read_only = True
+        else:
+            raise ValueError(f"Unknown DATA_BACKEND: {backend}")
+
+    def __getattr__(self, name):
+        return getattr(self.backend, name)
+
+
+read_store = ReadStore()
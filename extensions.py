@@ -1,9 +1,14 @@
 from flask_pymongo import PyMongo
 from flask_jwt_extended import JWTManager
 from flask import jsonify
+from cache import DocumentCache
+from review_buffer import ReviewWriteBuffer
 
 mongo = PyMongo()
 jwt = JWTManager()
+review_buffer = ReviewWriteBuffer(mongo)
+company_cache = DocumentCache(mongo, "companies")
+accomplishment_cache = DocumentCache(mongo, "accomplishments")
 
 # JWT Callbacks for Custom Error Handling
 @jwt.expired_token_loader
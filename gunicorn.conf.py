@@ -0,0 +1,55 @@
+import multiprocessing
+import os
+import time
+
+# Import the application once in the master, then fork workers that share its memory
+preload_app = True
+wsgi_app = "wsgi:app"
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+worker_class = "gthread"
+threads = int(os.getenv("THREADS", "4"))
+timeout = 30
+# On SIGTERM workers stop accepting connections and get this long to finish in-flight requests
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", "30"))
+keepalive = 5
+max_requests = int(os.getenv("MAX_REQUESTS", "0"))
+max_requests_jitter = int(os.getenv("MAX_REQUESTS_JITTER", "0"))
+
+_started = time.monotonic()
+
+
+def when_ready(server):
+    # Indexes are created once with a short-lived client that is closed before any fork
+    from pymongo import MongoClient
+    from app import app
+    from warmup import ensure_indexes
+
+    if app.config["DATA_BACKEND"] == "snapshot":
+        server.log.info(f"Master ready in {(time.monotonic() - _started) * 1000:.1f} ms (snapshot backend)")
+        return
+
+    # Fail fast when MongoDB is unreachable instead of holding the master for the default 30 s
+    client = MongoClient(app.config["MONGO_URI"], serverSelectionTimeoutMS=app.config["WARMUP_TIMEOUT_MS"])
+    try:
+        ensure_indexes(client.get_default_database())
+    except Exception as e:
+        server.log.warning(f"Could not ensure indexes: {str(e)}")
+    finally:
+        client.close()
+    server.log.info(f"Master ready in {(time.monotonic() - _started) * 1000:.1f} ms")
+
+
+def post_fork(server, worker):
+    from app import app
+    from warmup import init_worker
+
+    init_worker(app)
+
+
+def worker_exit(server, worker):
+    from app import app
+    from warmup import shutdown_worker
+
+    shutdown_worker(app)
@@ -1,4 +1,63 @@
-from extensions import mongo
+from models.repository import Repository, to_object_id
+
+
+class AccomplishmentRepository(Repository):
+    """
+    Queries on the 'accomplishments' collection.
+    """
+
+    collection_name = "accomplishments"
+    references = {"company_id": "companies"}
+
+    def find_by_company(self, company_id):
+        """
+        Returns the accomplishments of a company.
+
+        Args:
+            company_id (str or ObjectId): The company.
+
+        Returns:
+            list: The accomplishment documents.
+        """
+        return list(self.collection.find({"company_id": to_object_id(company_id)}, self.default_projection))
+
+    def top_for_company(self, company_id, limit):
+        """
+        Returns the accomplishments of a company with the highest achievement score.
+
+        Args:
+            company_id (str or ObjectId): The company.
+            limit (int): Number of accomplishments to return.
+
+        Returns:
+            list: The accomplishment documents, best first.
+        """
+        pipeline = [
+            {"$match": {"company_id": to_object_id(company_id)}},  # Convert to ObjectId for matching
+            {"$sort": {"achievement_score": -1}},  # Sort by achievement score
+            {"$limit": limit}
+        ]
+        return list(self.collection.aggregate(pipeline))
+
+    def totals_by_company(self):
+        """
+        Counts and sums the achievement scores of every company.
+
+        Returns:
+            dict: company ObjectId -> {"count", "total"}.
+        """
+        pipeline = [
+            {"$group": {
+                "_id": {"$convert": {"input": "$company_id", "to": "objectId", "onError": None}},
+                "count": {"$sum": 1},
+                "total": {"$sum": "$achievement_score"}
+            }}
+        ]
+        return {row["_id"]: row for row in self.collection.aggregate(pipeline)}
+
+
+accomplishment_repository = AccomplishmentRepository()
+
 
 def add_accomplishment(accomplishment_data):
     """
@@ -11,7 +70,7 @@ def add_accomplishment(accomplishment_data):
         dict: A response indicating success and the inserted accomplishment ID, or an error message if insertion fails.
     """
     try:
-        result = mongo.db.accomplishments.insert_one(accomplishment_data)
-        return {"success": True, "inserted_id": str(result.inserted_id)}
+        inserted_id = accomplishment_repository.insert(accomplishment_data)
+        return {"success": True, "inserted_id": str(inserted_id)}
     except Exception as e:
         return {"success": False, "error": str(e)}
@@ -1,4 +1,199 @@
-from extensions import mongo
+from pymongo import UpdateOne
+from models.repository import Repository, to_object_id
+from models.review import review_repository
+
+
+class CompanyRepository(Repository):
+    """
+    Queries on the 'companies' collection.
+
+    Lists and lookups by ID leave out the embedded `latest_reviews` summary; `get_profile` includes it.
+    """
+
+    collection_name = "companies"
+    default_projection = {"latest_reviews": 0}
+
+    def get_profile(self, company_id):
+        """
+        Returns a company together with its embedded latest reviews, for the company page.
+
+        Args:
+            company_id (str or ObjectId): The company.
+
+        Returns:
+            dict or None: The company document, or None if it does not exist.
+        """
+        return self.collection.find_one({"_id": to_object_id(company_id)})
+
+    def list_all(self):
+        """
+        Returns every company.
+
+        Returns:
+            list: The company documents.
+        """
+        return list(self.collection.find({}, self.default_projection))
+
+    def ids_in_industry(self, industry):
+        """
+        Returns the IDs of the companies in an industry.
+
+        Args:
+            industry (str): The industry name.
+
+        Returns:
+            list: ObjectIds of the matching companies.
+        """
+        return [company["_id"] for company in self.collection.find({"industry": industry}, {"_id": 1})]
+
+    def names(self):
+        """
+        Returns the name of every company.
+
+        Returns:
+            dict: ObjectId -> company name.
+        """
+        return {company["_id"]: company.get("name") for company in self.collection.find({}, {"name": 1})}
+
+    def top_rated(self, limit):
+        """
+        Returns the companies with the highest average review rating.
+
+        Args:
+            limit (int): Number of companies to return.
+
+        Returns:
+            list: Documents with `_id`, `name` and `averageRating`.
+        """
+        pipeline = [
+            review_repository.lookup_stage(),
+            {
+                "$addFields": {
+                    "averageRating": {"$avg": f"$reviews.{review_repository.rating_field}"}
+                }
+            },
+            {
+                "$sort": {"averageRating": -1}
+            },
+            {
+                "$limit": limit
+            },
+            {
+                "$project": {
+                    "name": 1,
+                    "averageRating": 1
+                }
+            }
+        ]
+        return list(self.collection.aggregate(pipeline))
+
+    def review_counts(self):
+        """
+        Returns the number of reviews of every company, most reviewed first.
+
+        Returns:
+            list: Documents with `_id`, `name` and `reviewCount`.
+        """
+        pipeline = [
+            review_repository.lookup_stage(),
+            {
+                "$project": {
+                    "name": 1,
+                    "reviewCount": {"$size": "$reviews"}
+                }
+            },
+            {
+                "$sort": {"reviewCount": -1}
+            }
+        ]
+        return list(self.collection.aggregate(pipeline))
+
+    def engagement(self):
+        """
+        Returns the review and accomplishment counts of every company, most engaged first.
+
+        Returns:
+            list: Documents with `_id`, `name`, `reviewCount` and `accomplishmentCount`.
+        """
+        pipeline = [
+            review_repository.lookup_stage(convert_ids=True),
+            {
+                "$lookup": {
+                    "from": "accomplishments",
+                    "let": {"companyId": "$_id"},
+                    "pipeline": [
+                        {
+                            "$addFields": {
+                                "company_id": {"$convert": {"input": "$company_id", "to": "objectId", "onError": None}}
+                            }
+                        },
+                        {"$match": {"$expr": {"$eq": ["$company_id", "$$companyId"]}}}
+                    ],
+                    "as": "accomplishments"
+                }
+            },
+            {
+                "$project": {
+                    "name": 1,
+                    "reviewCount": {"$size": "$reviews"},
+                    "accomplishmentCount": {"$size": "$accomplishments"}
+                }
+            },
+            {"$sort": {"reviewCount": -1, "accomplishmentCount": -1}}
+        ]
+        return list(self.collection.aggregate(pipeline))
+
+    def push_latest_reviews(self, summaries, limit):
+        """
+        Adds review summaries to the bounded `latest_reviews` array of their companies with one bulk write.
+
+        The array is kept sorted newest first and cut to `limit` entries by the same update.
+
+        Args:
+            summaries (dict): company ID -> list of review summaries, each with the review `_id`.
+            limit (int): Number of summaries kept per company.
+        """
+        if not summaries:
+            return
+        self.bulk_write(
+            [
+                UpdateOne(
+                    {"_id": to_object_id(company_id)},
+                    {"$push": {"latest_reviews": {"$each": entries, "$sort": {"_id": -1}, "$slice": limit}}}
+                )
+                for company_id, entries in summaries.items()
+            ],
+            ordered=False
+        )
+
+    def update_latest_review(self, company_id, review_id, fields):
+        """
+        Sets fields on the summary of a review, if the review is among the latest of its company.
+
+        Args:
+            company_id (str or ObjectId): The company of the review.
+            review_id (ObjectId): The review.
+            fields (dict): Summary fields to set.
+        """
+        self.forget(company_id)
+        self.collection.update_one(
+            {"_id": to_object_id(company_id), "latest_reviews._id": review_id},
+            {"$set": {f"latest_reviews.$.{key}": value for key, value in fields.items()}}
+        )
+
+    def pull_latest_review(self, company_id, review_id):
+        """
+        Removes the summary of a deleted review; the array stays one shorter until the next review.
+
+        Args:
+            company_id (str or ObjectId): The company of the review.
+            review_id (ObjectId): The review.
+        """
+        self.update_one(company_id, {"$pull": {"latest_reviews": {"_id": review_id}}})
+
+
+company_repository = CompanyRepository()
+
 
 def add_company(company_data):
     """
@@ -11,7 +206,7 @@ def add_company(company_data):
         dict: A response indicating success and the inserted company ID, or an error message if insertion fails.
     """
     try:
-        result = mongo.db.companies.insert_one(company_data)
-        return {"success": True, "inserted_id": str(result.inserted_id)}
+        inserted_id = company_repository.insert(company_data)
+        return {"success": True, "inserted_id": str(inserted_id)}
     except Exception as e:
         return {"success": False, "error": str(e)}
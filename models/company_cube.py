@@ -0,0 +1,260 @@
+from bson import ObjectId
+from pymongo import UpdateOne
+from models.accomplishments import accomplishment_repository
+from models.company import company_repository
+from models.repository import Repository
+from models.review import is_valid_rating, review_repository
+
+# Aggregate cube over companies keyed by industry x location x founded decade.
+#
+# 'company_cube' holds one document per cell:
+#   {"_id": {"industry", "location", "decade"}, "company_count", "review_count", "rating_sum",
+#    "accomplishment_count", "accomplishment_score_sum"}
+# 'company_cube_members' holds each company's own contribution and the cell it belongs to, so a
+# company whose dimensions change can be moved between cells exactly.
+
+DIMENSIONS = ("industry", "location", "decade")
+MEASURES = ("review_count", "rating_sum", "accomplishment_count", "accomplishment_score_sum")
+
+
+class CubeCellRepository(Repository):
+    """
+    Queries on the 'company_cube' collection, whose `_id`s are cell sub-documents.
+    """
+
+    collection_name = "company_cube"
+    track_identity = False
+
+    def _key(self, document_id):
+        return document_id
+
+
+class CubeMemberRepository(Repository):
+    """
+    Queries on the 'company_cube_members' collection. Lookups by ID return the cell only.
+    """
+
+    collection_name = "company_cube_members"
+    default_projection = {"cell": 1}
+
+
+cube_cell_repository = CubeCellRepository()
+cube_member_repository = CubeMemberRepository()
+
+
+def decade_of(founded):
+    """
+    Converts a founding year (int or string) to its decade, e.g. "2005" -> 2000.
+
+    Args:
+        founded: The founding year, or None.
+
+    Returns:
+        int or None: The decade, or None when the year is missing or not a number.
+    """
+    try:
+        return int(founded) // 10 * 10
+    except (TypeError, ValueError):
+        return None
+
+
+def cell_of(company):
+    return {
+        "industry": company.get("industry"),
+        "location": company.get("location"),
+        "decade": decade_of(company.get("founded"))
+    }
+
+
+def _apply(deltas):
+    # deltas: {company_id: {measure: amount}} -> one bulk write per collection
+    cells = _cells_for(list(deltas))
+    member_updates = []
+    cell_updates = []
+    for company_id, delta in deltas.items():
+        cell = cells.get(company_id)
+        if cell is None:
+            continue
+        member_updates.append(UpdateOne({"_id": company_id}, {"$inc": delta}))
+        cell_updates.append(UpdateOne({"_id": cell}, {"$inc": delta}, upsert=True))
+    cube_member_repository.bulk_write(member_updates)
+    cube_cell_repository.bulk_write(cell_updates)
+
+
+def _cells_for(company_ids):
+    # Looks up the cell of each company, registering companies the cube has not seen yet
+    cells = {company_id: member["cell"] for company_id, member in cube_member_repository.get_many(company_ids).items()}
+    missing = [company_id for company_id in company_ids if company_id not in cells]
+    if missing:
+        for company in company_repository.get_many(missing).values():
+            cells[company["_id"]] = add_company(company)
+    return cells
+
+
+def add_company(company):
+    """
+    Registers a company in the cube with empty measures.
+
+    Args:
+        company (dict): The company document, including `_id`.
+
+    Returns:
+        dict: The cell key of the company.
+    """
+    cell = cell_of(company)
+    result = cube_member_repository.update_one(
+        company["_id"],
+        {"$setOnInsert": dict({"cell": cell}, **{measure: 0 for measure in MEASURES})},
+        upsert=True
+    )
+    if result.upserted_id is not None:
+        cube_cell_repository.update_one(cell, {"$inc": {"company_count": 1}}, upsert=True)
+    return cell
+
+
+def move_company(company):
+    """
+    Moves a company and its measures to a new cell after its dimensions changed.
+
+    Args:
+        company (dict): The updated company document, including `_id`.
+    """
+    cell = cell_of(company)
+    member = cube_member_repository.update(company["_id"], {"cell": cell})
+    if member is None:
+        add_company(company)
+        return
+    if member["cell"] == cell:
+        return
+    measures = {measure: member.get(measure, 0) for measure in MEASURES}
+    cube_cell_repository.bulk_write([
+        UpdateOne(
+            {"_id": member["cell"]},
+            {"$inc": dict({"company_count": -1}, **{measure: -value for measure, value in measures.items()})}
+        ),
+        UpdateOne({"_id": cell}, {"$inc": dict({"company_count": 1}, **measures)}, upsert=True)
+    ], ordered=True)
+
+
+def remove_company(company_id):
+    """
+    Removes a deleted company and its measures from the cube.
+
+    Args:
+        company_id (ObjectId): The deleted company.
+    """
+    member = cube_member_repository.delete(company_id)
+    if member is not None:
+        cube_cell_repository.update_one(
+            member["cell"],
+            {"$inc": dict({"company_count": -1}, **{measure: -member.get(measure, 0) for measure in MEASURES})}
+        )
+
+
+def apply_reviews(reviews):
+    """
+    Adds newly stored reviews to the cube. Registered as a review buffer flush callback.
+
+    Args:
+        reviews (list): The stored review documents.
+    """
+    deltas = {}
+    for review in reviews:
+        # A review stored with an invalid rating is left out instead of failing the whole batch
+        if not is_valid_rating(review.get("rating")):
+            continue
+        delta = deltas.setdefault(review["company_id"], {"review_count": 0, "rating_sum": 0.0})
+        delta["review_count"] += 1
+        delta["rating_sum"] += float(review["rating"])
+    if deltas:
+        _apply(deltas)
+
+
+def update_rating(company_id, old_rating, new_rating):
+    _apply({company_id: {"rating_sum": float(new_rating) - float(old_rating)}})
+
+
+def remove_review(review):
+    _apply({review["company_id"]: {"review_count": -1, "rating_sum": -float(review["rating"])}})
+
+
+def apply_accomplishment(company_id, score_delta, count_delta=0):
+    """
+    Applies an accomplishment change to the cube.
+
+    Args:
+        company_id (ObjectId): The company the accomplishment belongs to.
+        score_delta (float): Change of the summed achievement score.
+        count_delta (int): Change of the accomplishment count (1 on create, -1 on delete).
+    """
+    _apply({company_id: {"accomplishment_count": count_delta, "accomplishment_score_sum": float(score_delta)}})
+
+
+def query(dimensions=(), filters=None):
+    """
+    Rolls the cube up to `dimensions`, restricted to the cells matching `filters`.
+
+    Asking for fewer dimensions rolls up; adding dimensions or filters drills down.
+
+    Args:
+        dimensions (iterable): Dimensions to group by, a subset of DIMENSIONS.
+        filters (dict, optional): Exact values for some dimensions, e.g. {"industry": "Finance"}.
+
+    Returns:
+        list: One row per group with counts and averages.
+    """
+    match = {f"_id.{dimension}": value for dimension, value in (filters or {}).items()}
+    group = {"_id": {dimension: f"$_id.{dimension}" for dimension in dimensions} if dimensions else None}
+    for measure in ("company_count",) + MEASURES:
+        group[measure] = {"$sum": f"${measure}"}
+    pipeline = [{"$match": match}, {"$group": group}, {"$sort": {"review_count": -1}}]
+
+    rows = []
+    for cell in cube_cell_repository.aggregate(pipeline):
+        row = dict(cell["_id"] or {})
+        row.update({
+            "companyCount": cell["company_count"],
+            "reviewCount": cell["review_count"],
+            "averageRating": round(cell["rating_sum"] / cell["review_count"], 2) if cell["review_count"] else None,
+            "accomplishmentCount": cell["accomplishment_count"],
+            "averageAccomplishmentScore": (
+                round(cell["accomplishment_score_sum"] / cell["accomplishment_count"], 2)
+                if cell["accomplishment_count"] else None
+            )
+        })
+        rows.append(row)
+    return rows
+
+
+def rebuild_cube():
+    """
+    Recomputes the whole cube from the companies, reviews and accomplishments collections.
+
+    Returns:
+        int: The number of cells written.
+    """
+    reviews = review_repository.totals_by_company()
+    accomplishments = accomplishment_repository.totals_by_company()
+
+    members = []
+    cells = {}
+    for company in company_repository.find_all({"industry": 1, "location": 1, "founded": 1}):
+        company_id = ObjectId(company["_id"])
+        member = {
+            "_id": company_id,
+            "cell": cell_of(company),
+            "review_count": reviews.get(company_id, {}).get("count", 0),
+            "rating_sum": float(reviews.get(company_id, {}).get("total", 0)),
+            "accomplishment_count": accomplishments.get(company_id, {}).get("count", 0),
+            "accomplishment_score_sum": float(accomplishments.get(company_id, {}).get("total", 0))
+        }
+        members.append(member)
+        key = tuple(member["cell"][dimension] for dimension in DIMENSIONS)
+        cell = cells.setdefault(key, dict({"_id": member["cell"], "company_count": 0}, **{m: 0 for m in MEASURES}))
+        cell["company_count"] += 1
+        for measure in MEASURES:
+            cell[measure] += member[measure]
+
+    cube_member_repository.replace_all(members)
+    cube_cell_repository.replace_all(list(cells.values()))
+    return len(cells)
@@ -0,0 +1,147 @@
+from datetime import datetime, timedelta
+from bson import ObjectId
+from pymongo import ReplaceOne
+from models.company import company_repository
+from models.repository import Repository
+from models.review import review_repository
+
+# 'company_similar' holds one document per company:
+#   {"_id": company_id, "neighbours": [{"company_id", "name", "score"}], "updated_at"}
+# 'company_similar_state' remembers when the last refresh started, minus a safety margin.
+
+STATE_ID = "refresh"
+# Covers clock skew between workers and flushes in progress when a refresh starts
+WATERMARK_MARGIN = timedelta(minutes=5)
+# Most neighbours the API returns for a company
+MAX_NEIGHBOURS = 100
+
+
+class SimilarCompaniesRepository(Repository):
+    """
+    Queries on the 'company_similar' collection.
+    """
+
+    collection_name = "company_similar"
+    default_projection = {"neighbours": {"$slice": MAX_NEIGHBOURS}, "updated_at": 0}
+
+
+class SimilarStateRepository(Repository):
+    """
+    Queries on the 'company_similar_state' collection, keyed by name.
+    """
+
+    collection_name = "company_similar_state"
+
+    def _key(self, document_id):
+        return document_id
+
+
+similar_repository = SimilarCompaniesRepository()
+similar_state_repository = SimilarStateRepository()
+
+
+def get_similar(company_id, limit):
+    """
+    Returns the precomputed similar companies of a company.
+
+    Args:
+        company_id (ObjectId): The company to look up.
+        limit (int): Maximum number of neighbours to return.
+
+    Returns:
+        list or None: The neighbours, best first, or None when the company has no entry.
+    """
+    document = similar_repository.get(company_id)
+    if document is None:
+        return None
+    return [
+        {"company_id": str(neighbour["company_id"]), "name": neighbour.get("name"), "score": neighbour["score"]}
+        for neighbour in document["neighbours"][:limit]
+    ]
+
+
+def refresh_similar_companies(k=20, full=False, chunk_size=50000):
+    """
+    Recomputes the top-K similar companies from the 'reviews' collection.
+
+    Reviews are streamed in chunks into a compact sparse rating matrix. A full refresh rewrites
+    every company. An incremental refresh finds the users who wrote a review since the last run
+    (by the `created_at` stamp the review buffer sets when it writes a review), takes the set R of
+    companies those users rated, and recomputes R together with every company that shares a
+    reviewer with R: a new review shifts its user's mean rating, which changes the similarity
+    between each company in R and any company co-rated with it. Edited and deleted reviews, and
+    reviews without `created_at`, are only picked up by a full refresh.
+
+    Args:
+        k (int): Number of neighbours to keep per company.
+        full (bool): Recompute every company instead of only the affected ones.
+        chunk_size (int): Number of reviews read per chunk.
+
+    Returns:
+        int: The number of companies whose neighbour list was written.
+    """
+    import numpy as np
+    from similarity import RatingMatrixBuilder, top_k_similar
+
+    state = similar_state_repository.get(STATE_ID) or {}
+    watermark = None if full else state.get("watermark")
+    # Reviews written by a flush that was still running when this refresh started can carry a
+    # slightly older stamp, so the next run looks back WATERMARK_MARGIN before this start time
+    started_at = datetime.utcnow()
+    new_users = review_repository.users_since(watermark) if watermark is not None else set()
+
+    builder = RatingMatrixBuilder()
+    chunk = []
+    for review in review_repository.iter_ratings(chunk_size):
+        chunk.append(review)
+        if len(chunk) >= chunk_size:
+            builder.add_chunk(chunk)
+            chunk = []
+    if chunk:
+        builder.add_chunk(chunk)
+
+    matrix = builder.build()
+    companies = {index: key for key, index in builder.company_index.items()}
+
+    if watermark is None:
+        columns = None
+    else:
+        rows = [builder.user_index[user] for user in new_users if user in builder.user_index]
+        if not rows:
+            _save_state(started_at)
+            return 0
+        changed = np.unique(matrix[rows].indices)
+        co_reviewers = np.unique(matrix.tocsc()[:, changed].indices)
+        columns = np.union1d(changed, matrix[co_reviewers].indices)
+
+    neighbours = top_k_similar(matrix, k, columns)
+
+    names = {str(company_id): name for company_id, name in company_repository.names().items()}
+    now = datetime.utcnow()
+    writes = [
+        ReplaceOne(
+            {"_id": ObjectId(companies[column])},
+            {
+                "neighbours": [
+                    {"company_id": ObjectId(companies[other]), "name": names.get(companies[other]), "score": round(score, 4)}
+                    for other, score in similar
+                ],
+                "updated_at": now
+            },
+            upsert=True
+        )
+        for column, similar in neighbours.items()
+    ]
+    for start in range(0, len(writes), chunk_size):
+        similar_repository.bulk_write(writes[start:start + chunk_size])
+
+    _save_state(started_at)
+    return len(writes)
+
+
+def _save_state(started_at):
+    similar_state_repository.update_one(
+        STATE_ID,
+        {"$set": {"watermark": started_at - WATERMARK_MARGIN, "updated_at": datetime.utcnow()}},
+        upsert=True
+    )
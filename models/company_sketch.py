@@ -0,0 +1,172 @@
+from bson import Binary, ObjectId
+from pymongo import UpdateOne
+from models.repository import Repository
+from models.review import is_valid_rating, review_repository
+from sketches import HyperLogLog, RatingHistogram
+
+# One document per company in 'company_sketches':
+#   {"_id": company_id, "reviewers": {register: rank}, "reviewers_dense": BinData, "reviewers_pending": n,
+#    "ratings": {bucket: count}, "review_count": n}
+#
+# New reviewers are always written with `$max` into the sparse "reviewers" sub-document, which is
+# atomic under concurrent flushes. Once a company may have more sparse registers than
+# HyperLogLog.sparse_limit ("reviewers_pending" counts reviews since the last fold, an upper bound),
+# the sparse registers are folded into "reviewers_dense" (4 KB at precision 12). Readers merge both.
+
+
+class CompanySketchRepository(Repository):
+    """
+    Queries on the 'company_sketches' collection.
+    """
+
+    collection_name = "company_sketches"
+
+
+sketch_repository = CompanySketchRepository()
+
+
+def apply_reviews(reviews):
+    """
+    Adds newly stored reviews to the sketches of their companies with one bulk write.
+
+    Registered as a review buffer flush callback, so it runs once per flush.
+
+    Args:
+        reviews (list): The stored review documents.
+    """
+    updates = {}
+    for review in reviews:
+        # A review stored with an invalid rating is left out instead of failing the whole batch
+        if not is_valid_rating(review.get("rating")):
+            continue
+        company_id = review["company_id"]
+        update = updates.setdefault(company_id, {"$max": {}, "$inc": {"review_count": 0, "reviewers_pending": 0}})
+        index, rank = HyperLogLog.register_for(review["user_id"])
+        field = f"reviewers.{index}"
+        update["$max"][field] = max(update["$max"].get(field, 0), rank)
+        bucket = f"ratings.{RatingHistogram.bucket_for(review['rating'])}"
+        update["$inc"][bucket] = update["$inc"].get(bucket, 0) + 1
+        update["$inc"]["review_count"] += 1
+        update["$inc"]["reviewers_pending"] += 1
+
+    sketch_repository.bulk_write(
+        [UpdateOne({"_id": company_id}, update, upsert=True) for company_id, update in updates.items()]
+    )
+    if updates:
+        crowded = sketch_repository.find(
+            {"_id": {"$in": list(updates)}, "reviewers_pending": {"$gt": HyperLogLog().sparse_limit}},
+            {"_id": 1}
+        )
+        fold_reviewers([document["_id"] for document in crowded])
+
+
+def fold_reviewers(company_ids):
+    """
+    Moves the sparse reviewer registers of companies into their dense binary form.
+
+    Each fold only succeeds if none of the folded registers changed in between, so a concurrent
+    `$max` is never lost; a company whose fold fails is folded again after its next reviews.
+
+    Args:
+        company_ids (list): ObjectIds of the companies to fold.
+    """
+    writes = []
+    for document in sketch_repository.find(
+        {"_id": {"$in": company_ids}},
+        {"reviewers": 1, "reviewers_dense": 1, "reviewers_pending": 1}
+    ):
+        sparse = document.get("reviewers") or {}
+        dense = document.get("reviewers_dense")
+        reviewers = HyperLogLog(registers=sparse, dense=dense)
+        query = {"_id": document["_id"], "reviewers_dense": dense if dense is not None else {"$exists": False}}
+        query.update({f"reviewers.{index}": rank for index, rank in sparse.items()})
+        update = {
+            "$set": {"reviewers_dense": Binary(reviewers.to_bytes())},
+            "$inc": {"reviewers_pending": -document.get("reviewers_pending", 0)}
+        }
+        if sparse:
+            update["$unset"] = {f"reviewers.{index}": "" for index in sparse}
+        writes.append(UpdateOne(query, update))
+    sketch_repository.bulk_write(writes)
+
+
+def update_rating(company_id, old_rating, new_rating):
+    """
+    Moves one review from the bucket of its old rating to the bucket of its new rating.
+
+    Args:
+        company_id (ObjectId): The company the review belongs to.
+        old_rating (float): The rating before the update.
+        new_rating (float): The rating after the update.
+    """
+    old_bucket = RatingHistogram.bucket_for(old_rating)
+    new_bucket = RatingHistogram.bucket_for(new_rating)
+    if old_bucket != new_bucket:
+        sketch_repository.update_one(company_id, {"$inc": {f"ratings.{old_bucket}": -1, f"ratings.{new_bucket}": 1}})
+
+
+def remove_review(review):
+    """
+    Removes a deleted review from the rating histogram of its company.
+
+    The distinct reviewer sketch cannot forget a user, so it keeps counting them.
+
+    Args:
+        review (dict): The deleted review document.
+    """
+    sketch_repository.update_one(
+        review["company_id"],
+        {"$inc": {f"ratings.{RatingHistogram.bucket_for(review['rating'])}": -1, "review_count": -1}}
+    )
+
+
+def get_sketches(company_ids):
+    """
+    Loads and merges the sketches of one or more companies.
+
+    Args:
+        company_ids (list): ObjectIds of the companies to merge.
+
+    Returns:
+        tuple: (HyperLogLog, RatingHistogram, number of companies with a sketch)
+    """
+    reviewers = HyperLogLog()
+    ratings = RatingHistogram()
+    found = 0
+    for document in sketch_repository.get_many(company_ids).values():
+        reviewers.merge(HyperLogLog(registers=document.get("reviewers"), dense=document.get("reviewers_dense")))
+        ratings.merge(RatingHistogram(document.get("ratings")))
+        found += 1
+    return reviewers, ratings, found
+
+
+def rebuild_sketches():
+    """
+    Recomputes every company sketch from the 'reviews' collection.
+
+    Returns:
+        int: The number of companies whose sketch was written.
+    """
+    sketches = {}
+    for review in review_repository.iter_ratings():
+        company_id = ObjectId(review["company_id"])
+        reviewers, ratings = sketches.setdefault(company_id, (HyperLogLog(), RatingHistogram()))
+        reviewers.add(review["user_id"])
+        ratings.add(review["rating"])
+
+    sketch_repository.replace_all([
+        dict(
+            {
+                "_id": company_id,
+                "reviewers_pending": 0,
+                "ratings": ratings.to_document(),
+                "review_count": ratings.total
+            },
+            **(
+                {"reviewers": {}, "reviewers_dense": Binary(reviewers.to_bytes())}
+                if reviewers.occupied > reviewers.sparse_limit else {"reviewers": reviewers.to_document()}
+            )
+        )
+        for company_id, (reviewers, ratings) in sketches.items()
+    ])
+    return len(sketches)
@@ -0,0 +1,270 @@
+from bson import ObjectId
+from bson.errors import InvalidId
+from flask import g, has_app_context
+from extensions import mongo
+
+
+def to_object_id(document_id):
+    """
+    Converts a string ID to an ObjectId, leaving ObjectIds untouched.
+
+    Args:
+        document_id (str or ObjectId): The ID to convert.
+
+    Returns:
+        ObjectId: The converted ID.
+    """
+    return document_id if isinstance(document_id, ObjectId) else ObjectId(document_id)
+
+
+class Repository:
+    """
+    Base class for the collection repositories in models/.
+
+    Lookups by `_id` go through a per-request identity map, so a document is fetched at most once
+    per request (or app context). Documents loaded by ID queue the documents they reference
+    (`references`), which are fetched together with the next lookup of their repository in a
+    single `$in` query, so resolving them later in the request costs no extra round trip.
+    Documents are read with the repository's default projection. Callers receive copies, so they
+    can convert IDs in place without touching the identity map. Writes made through the
+    repository drop the documents they touch from the identity map.
+    """
+
+    collection_name = None
+    # Default projection of lookups by ID and of the query methods; None returns whole documents
+    default_projection = None
+    # Reference fields of the documents, as field -> collection name of the referenced documents
+    references = {}
+    # Whether lookups by ID go through the identity map; off for collections keyed by sub-documents
+    track_identity = True
+
+    @property
+    def collection(self):
+        return mongo.db[self.collection_name]
+
+    def _key(self, document_id):
+        # Normalizes an ID to the type stored in `_id`
+        return to_object_id(document_id)
+
+    @staticmethod
+    def _state_of(collection_name):
+        # (identity map, pending IDs) of a collection in the current app context; a throwaway pair outside of one
+        if not has_app_context():
+            return {}, set()
+        maps = g.setdefault("identity_maps", {})
+        return maps.setdefault(collection_name, ({}, set()))
+
+    def _state(self):
+        return self._state_of(self.collection_name)
+
+    def _queue_references(self, documents):
+        for field, collection_name in self.references.items():
+            identity_map, pending = self._state_of(collection_name)
+            for document in documents:
+                try:
+                    key = to_object_id(document[field])
+                except (KeyError, TypeError, InvalidId):
+                    continue
+                if key not in identity_map:
+                    pending.add(key)
+
+    def get(self, document_id):
+        """
+        Returns the document with the given ID, loading any queued referenced IDs in the same query.
+
+        Args:
+            document_id (str or ObjectId): The ID to look up.
+
+        Returns:
+            dict or None: A copy of the document, or None if it does not exist.
+        """
+        return self.get_many([document_id]).get(self._key(document_id))
+
+    def get_many(self, document_ids):
+        """
+        Returns the documents with the given IDs, fetching the ones not in the identity map with one `$in` query.
+
+        Args:
+            document_ids (iterable): IDs (str or ObjectId) to look up.
+
+        Returns:
+            dict: ObjectId -> copy of the document, for the IDs that exist.
+        """
+        identity_map, pending = self._state()
+        keys = [self._key(document_id) for document_id in document_ids]
+        pending.update(key for key in keys if key not in identity_map)
+        if pending:
+            missing = list(pending)
+            documents = list(self.collection.find({"_id": {"$in": missing}}, self.default_projection))
+            # Only a query that succeeded records IDs as not found; after a failure they stay pending
+            pending.difference_update(missing)
+            for key in missing:
+                identity_map[key] = None
+            for document in documents:
+                identity_map[document["_id"]] = document
+            self._queue_references(documents)
+        return {key: dict(identity_map[key]) for key in keys if identity_map.get(key) is not None}
+
+    def forget(self, document_id):
+        """
+        Drops a document from the identity map after it was written.
+
+        Args:
+            document_id (str or ObjectId): The ID of the written document.
+        """
+        if self.track_identity:
+            identity_map, _ = self._state()
+            identity_map.pop(self._key(document_id), None)
+
+    def forget_all(self):
+        """
+        Empties the identity map of this repository after a write that touched many documents.
+        """
+        identity_map, _ = self._state()
+        identity_map.clear()
+
+    def insert(self, document):
+        """
+        Inserts a document.
+
+        Args:
+            document (dict): The document; its `_id` is set by the driver if missing.
+
+        Returns:
+            ObjectId: The `_id` of the inserted document.
+        """
+        return self.collection.insert_one(document).inserted_id
+
+    def update(self, document_id, fields):
+        """
+        Sets fields on a document.
+
+        Args:
+            document_id (str or ObjectId): The document to update.
+            fields (dict): Fields to set.
+
+        Returns:
+            dict or None: The document as it was before the update, or None if it does not exist.
+        """
+        self.forget(document_id)
+        return self.collection.find_one_and_update({"_id": self._key(document_id)}, {"$set": fields})
+
+    def delete(self, document_id):
+        """
+        Deletes a document.
+
+        Args:
+            document_id (str or ObjectId): The document to delete.
+
+        Returns:
+            dict or None: The deleted document, or None if it did not exist.
+        """
+        self.forget(document_id)
+        return self.collection.find_one_and_delete({"_id": self._key(document_id)})
+
+    def update_one(self, document_id, update, upsert=False):
+        """
+        Applies an update document to one document.
+
+        Args:
+            document_id: The `_id` of the document.
+            update (dict): The update operators.
+            upsert (bool): Insert the document if it does not exist.
+
+        Returns:
+            UpdateResult: The driver result.
+        """
+        self.forget(document_id)
+        return self.collection.update_one({"_id": self._key(document_id)}, update, upsert=upsert)
+
+    def update_many(self, query, update):
+        """
+        Applies an update document to every matching document.
+
+        Args:
+            query (dict): The filter.
+            update (dict): The update operators.
+
+        Returns:
+            UpdateResult: The driver result.
+        """
+        self.forget_all()
+        return self.collection.update_many(query, update)
+
+    def delete_many(self, query):
+        """
+        Deletes every matching document.
+
+        Args:
+            query (dict): The filter.
+
+        Returns:
+            DeleteResult: The driver result.
+        """
+        self.forget_all()
+        return self.collection.delete_many(query)
+
+    def bulk_write(self, requests, ordered=False):
+        """
+        Sends a batch of write operations in one round trip.
+
+        Args:
+            requests (list): pymongo write operations.
+            ordered (bool): Stop at the first failed operation.
+
+        Returns:
+            BulkWriteResult or None: The driver result, or None when there was nothing to write.
+        """
+        if not requests:
+            return None
+        self.forget_all()
+        return self.collection.bulk_write(requests, ordered=ordered)
+
+    def replace_all(self, documents):
+        """
+        Replaces the whole content of the collection, as rebuild commands do.
+
+        Args:
+            documents (list): The new documents.
+        """
+        self.forget_all()
+        self.collection.delete_many({})
+        if documents:
+            self.collection.insert_many(documents)
+
+    def find(self, query, projection=None):
+        """
+        Iterates over the documents matching a filter.
+
+        Args:
+            query (dict): The filter.
+            projection (dict, optional): Fields to return; the default projection otherwise.
+
+        Returns:
+            Cursor: The documents.
+        """
+        return self.collection.find(query, projection or self.default_projection)
+
+    def aggregate(self, pipeline):
+        """
+        Runs an aggregation pipeline on the collection.
+
+        Args:
+            pipeline (list): The stages.
+
+        Returns:
+            CommandCursor: The results.
+        """
+        return self.collection.aggregate(pipeline)
+
+    def find_all(self, projection=None):
+        """
+        Iterates over every document of the collection.
+
+        Args:
+            projection (dict, optional): Fields to return; the default projection otherwise.
+
+        Returns:
+            Cursor: The documents.
+        """
+        return self.collection.find({}, projection or self.default_projection)
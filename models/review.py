@@ -1,4 +1,304 @@
-from extensions import mongo
+from flask import current_app, has_app_context
+from pymongo import ReplaceOne
+from models.repository import Repository, to_object_id
+from sketches import RatingHistogram
+
+
+def compact_storage():
+    """
+    Tells whether review analytics read the lean 'review_metrics' collection (REVIEW_STORAGE_MODE "compact").
+
+    Returns:
+        bool: True in compact mode.
+    """
+    return has_app_context() and current_app.config.get("REVIEW_STORAGE_MODE") == "compact"
+
+
+def is_valid_rating(value):
+    """
+    Tells whether a value can be stored as a review rating.
+
+    Args:
+        value: The rating from the request or a stored review.
+
+    Returns:
+        bool: True for a number between RatingHistogram.MIN_RATING and MAX_RATING.
+    """
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return False
+    return RatingHistogram.MIN_RATING <= value <= RatingHistogram.MAX_RATING
+
+
+class ReviewMetricsRepository(Repository):
+    """
+    Queries on the 'review_metrics' collection: one lean document per review, without its text.
+
+    Documents share the `_id` of their review and use short field names, since they are repeated
+    in every document: `c` (company ObjectId), `u` (user ObjectId) and `r` (rating).
+    """
+
+    collection_name = "review_metrics"
+
+    @staticmethod
+    def to_metric(review):
+        """
+        Builds the metrics document of a review.
+
+        Args:
+            review (dict): The review document.
+
+        Returns:
+            dict: The metrics document.
+        """
+        return {
+            "_id": review["_id"],
+            "c": to_object_id(review["company_id"]),
+            "u": to_object_id(review["user_id"]),
+            "r": review.get("rating")
+        }
+
+    def save_many(self, reviews):
+        """
+        Writes the metrics of a batch of reviews; writing the same review twice is harmless.
+
+        Args:
+            reviews (list): The stored review documents.
+        """
+        if reviews:
+            self.collection.bulk_write(
+                [ReplaceOne({"_id": review["_id"]}, self.to_metric(review), upsert=True) for review in reviews],
+                ordered=False
+            )
+
+    def update_rating(self, review_id, rating):
+        """
+        Sets the rating of a review.
+
+        Args:
+            review_id (str or ObjectId): The review.
+            rating (float): The new rating.
+        """
+        self.collection.update_one({"_id": to_object_id(review_id)}, {"$set": {"r": rating}})
+
+    def iter_ratings(self, batch_size=1000):
+        """
+        Streams the metrics of every rated review under the field names of the 'reviews' collection.
+
+        Args:
+            batch_size (int): Number of documents fetched per round trip.
+
+        Returns:
+            generator: Documents with `_id`, `user_id`, `company_id` and `rating`.
+        """
+        cursor = self.collection.find({"r": {"$ne": None}}).batch_size(batch_size)
+        return (
+            {"_id": metric["_id"], "user_id": metric["u"], "company_id": metric["c"], "rating": metric["r"]}
+            for metric in cursor
+        )
+
+    def average_rating(self, company_id):
+        """
+        Compact-mode counterpart of `ReviewRepository.average_rating`, with the same result.
+        """
+        pipeline = [
+            {"$match": {"c": to_object_id(company_id)}},
+            {"$group": {"_id": "$c", "averageRating": {"$avg": "$r"}}}
+        ]
+        result = list(self.collection.aggregate(pipeline))
+        return result[0] if result else None
+
+    def rating_distribution(self, company_id):
+        """
+        Compact-mode counterpart of `ReviewRepository.rating_distribution`, with the same result.
+        """
+        pipeline = [
+            {"$match": {"c": to_object_id(company_id)}},
+            {"$group": {"_id": "$r", "count": {"$sum": 1}}},
+            {"$sort": {"_id": 1}}
+        ]
+        return list(self.collection.aggregate(pipeline))
+
+    def totals_by_company(self):
+        """
+        Compact-mode counterpart of `ReviewRepository.totals_by_company`, with the same result.
+        """
+        pipeline = [
+            {"$group": {"_id": "$c", "count": {"$sum": 1}, "total": {"$sum": "$r"}}}
+        ]
+        return {row["_id"]: row for row in self.collection.aggregate(pipeline)}
+
+
+review_metrics_repository = ReviewMetricsRepository()
+
+
+class ReviewRepository(Repository):
+    """
+    Queries on the 'reviews' collection.
+
+    In compact storage mode the rating analytics are answered from 'review_metrics' instead, so
+    they never read review texts.
+    """
+
+    collection_name = "reviews"
+    # `created_at` is the write marker of incremental jobs, not part of the API
+    default_projection = {"created_at": 0}
+    references = {"company_id": "companies", "user_id": "users"}
+
+    def lookup_stage(self, convert_ids=False):
+        """
+        Returns the `$lookup` stage that joins the reviews of each company as `reviews`.
+
+        Args:
+            convert_ids (bool): Also match reviews whose `company_id` is stored as a string.
+
+        Returns:
+            dict: The stage. In compact mode it joins the metrics, whose rating field is `rating_field`.
+        """
+        if compact_storage():
+            # Metrics always hold ObjectIds, so the plain (indexed) join matches every review
+            return {"$lookup": {"from": "review_metrics", "localField": "_id", "foreignField": "c", "as": "reviews"}}
+        if convert_ids:
+            return {
+                "$lookup": {
+                    "from": "reviews",
+                    "let": {"companyId": "$_id"},
+                    "pipeline": [
+                        {
+                            "$addFields": {
+                                "company_id": {"$convert": {"input": "$company_id", "to": "objectId", "onError": None}}
+                            }
+                        },
+                        {"$match": {"$expr": {"$eq": ["$company_id", "$$companyId"]}}}
+                    ],
+                    "as": "reviews"
+                }
+            }
+        return {"$lookup": {"from": "reviews", "localField": "_id", "foreignField": "company_id", "as": "reviews"}}
+
+    @property
+    def rating_field(self):
+        return "r" if compact_storage() else "rating"
+
+    def find_by_company(self, company_id):
+        """
+        Returns the reviews of a company.
+
+        Args:
+            company_id (str or ObjectId): The company.
+
+        Returns:
+            list: The review documents.
+        """
+        return list(self.collection.find({"company_id": to_object_id(company_id)}, self.default_projection))
+
+    def insert_many(self, reviews):
+        """
+        Inserts a batch of reviews in one round trip; the batch continues past failed documents.
+
+        Args:
+            reviews (list): Review documents with pre-generated `_id`s.
+        """
+        self.collection.insert_many(reviews, ordered=False)
+
+    def iter_ratings(self, batch_size=1000):
+        """
+        Streams the `user_id`, `company_id` and `rating` of every rated review.
+
+        Args:
+            batch_size (int): Number of reviews fetched per round trip.
+
+        Returns:
+            iterable: The projected review documents.
+        """
+        if compact_storage():
+            return review_metrics_repository.iter_ratings(batch_size)
+        return self.collection.find(
+            {"rating": {"$ne": None}},
+            {"user_id": 1, "company_id": 1, "rating": 1}
+        ).batch_size(batch_size)
+
+    def users_since(self, since):
+        """
+        Returns the users who wrote a review stored after a point in time.
+
+        Args:
+            since (datetime): Reviews with a later `created_at` are considered.
+
+        Returns:
+            set: The user IDs as strings.
+        """
+        return {str(user_id) for user_id in self.collection.distinct("user_id", {"created_at": {"$gt": since}})}
+
+    def average_rating(self, company_id):
+        """
+        Computes the average rating of a company.
+
+        Args:
+            company_id (str or ObjectId): The company.
+
+        Returns:
+            dict or None: `_id` and `averageRating`, or None if the company has no reviews.
+        """
+        if compact_storage():
+            return review_metrics_repository.average_rating(company_id)
+        pipeline = [
+            {"$match": {"company_id": to_object_id(company_id)}},  # Match reviews for this company
+            {"$group": {
+                "_id": "$company_id",
+                "averageRating": {"$avg": "$rating"}
+            }}
+        ]
+        result = list(self.collection.aggregate(pipeline))
+        return result[0] if result else None
+
+    def rating_distribution(self, company_id):
+        """
+        Counts the reviews of a company per rating.
+
+        Args:
+            company_id (str or ObjectId): The company.
+
+        Returns:
+            list: Documents with the rating as `_id` and its `count`, by ascending rating.
+        """
+        if compact_storage():
+            return review_metrics_repository.rating_distribution(company_id)
+        pipeline = [
+            {
+                "$addFields": {
+                    "company_id": {"$convert": {"input": "$company_id", "to": "objectId", "onError": None}}
+                }
+            },
+            {"$match": {"company_id": to_object_id(company_id)}},
+            {"$group": {
+                "_id": "$rating",
+                "count": {"$sum": 1}
+            }},
+            {"$sort": {"_id": 1}}
+        ]
+        return list(self.collection.aggregate(pipeline))
+
+    def totals_by_company(self):
+        """
+        Counts and sums the ratings of every company.
+
+        Returns:
+            dict: company ObjectId -> {"count", "total"}.
+        """
+        if compact_storage():
+            return review_metrics_repository.totals_by_company()
+        pipeline = [
+            {"$group": {
+                "_id": {"$convert": {"input": "$company_id", "to": "objectId", "onError": None}},
+                "count": {"$sum": 1},
+                "total": {"$sum": "$rating"}
+            }}
+        ]
+        return {row["_id"]: row for row in self.collection.aggregate(pipeline)}
+
+
+review_repository = ReviewRepository()
+
 
 def add_review(review_data):
     """
@@ -11,7 +311,7 @@ def add_review(review_data):
         dict: A response indicating success and the inserted review ID, or an error message if insertion fails.
     """
     try:
-        result = mongo.db.reviews.insert_one(review_data)
-        return {"success": True, "inserted_id": str(result.inserted_id)}
+        inserted_id = review_repository.insert(review_data)
+        return {"success": True, "inserted_id": str(inserted_id)}
     except Exception as e:
         return {"success": False, "error": str(e)}
@@ -0,0 +1,324 @@
+from flask import current_app
+from pymongo import ASCENDING, UpdateOne
+from extensions import company_cache
+from models.company import company_repository
+from models.repository import to_object_id
+from models.review import compact_storage, review_metrics_repository, review_repository
+
+# Compact review storage (REVIEW_STORAGE_MODE = "compact"):
+#   'reviews' keeps the full documents, text included, for the review endpoints.
+#   'review_metrics' holds {"_id": review_id, "c": company_id, "u": user_id, "r": rating} for the analytics.
+# With COMPANY_LATEST_REVIEWS > 0 every company document also embeds its newest reviews:
+#   "latest_reviews": [{"_id", "user_id", "rating", "review_text" (first EXCERPT_LENGTH characters)}]
+
+EXCERPT_LENGTH = 200
+# Collections reported by the migration, and the ones each storage mode reads for ratings and company pages
+REPORTED_COLLECTIONS = ["reviews", "review_metrics", "companies"]
+WORKING_SETS = {
+    "classic": ["reviews", "companies"],
+    "compact": ["review_metrics", "companies"]
+}
+
+
+def summary_of(review):
+    """
+    Builds the summary of a review embedded in its company document.
+
+    Args:
+        review (dict): The review document.
+
+    Returns:
+        dict: The summary.
+    """
+    return {
+        "_id": review["_id"],
+        "user_id": review.get("user_id"),
+        "rating": review.get("rating"),
+        "review_text": (review.get("review_text") or "")[:EXCERPT_LENGTH]
+    }
+
+
+def _latest_limit():
+    return current_app.config.get("COMPANY_LATEST_REVIEWS", 0)
+
+
+def apply_reviews(reviews):
+    """
+    Writes the metrics and company summaries of newly stored reviews.
+
+    Registered as a review buffer flush callback, so it runs once per flush.
+
+    Args:
+        reviews (list): The stored review documents.
+    """
+    if compact_storage():
+        review_metrics_repository.save_many(reviews)
+
+    limit = _latest_limit()
+    if limit > 0 and reviews:
+        summaries = {}
+        for review in reviews:
+            summaries.setdefault(str(review["company_id"]), []).append(summary_of(review))
+        company_repository.push_latest_reviews(summaries, limit)
+        _discard_companies(summaries)
+
+
+def update_review(review, fields):
+    """
+    Applies an edited rating or text to the metrics and company summary of a review.
+
+    Args:
+        review (dict): The review as it was before the update.
+        fields (dict): The updated `rating` and `review_text`.
+    """
+    if compact_storage() and fields.get("rating") != review.get("rating"):
+        review_metrics_repository.update_rating(review["_id"], fields["rating"])
+
+    if _latest_limit() > 0:
+        summary = summary_of(dict(review, **fields))
+        company_repository.update_latest_review(
+            review["company_id"], review["_id"],
+            {"rating": summary["rating"], "review_text": summary["review_text"]}
+        )
+        _discard_companies([str(review["company_id"])])
+
+
+def remove_review(review):
+    """
+    Removes a deleted review from the metrics and from the summary of its company.
+
+    Args:
+        review (dict): The deleted review document.
+    """
+    if compact_storage():
+        review_metrics_repository.delete(review["_id"])
+
+    if _latest_limit() > 0:
+        company_repository.pull_latest_review(review["company_id"], review["_id"])
+        _discard_companies([str(review["company_id"])])
+
+
+def _discard_companies(company_ids):
+    # Review traffic must not bump the cache version, which would wipe every worker's company cache
+    # on each flush: only this worker drops the companies, other workers see the new summary once
+    # their entry is older than CACHE_MAX_STALENESS_SECONDS
+    for company_id in company_ids:
+        company_cache.discard(company_id)
+
+
+def rebuild_review_metrics(batch_size=1000):
+    """
+    Reconciles 'review_metrics' and the embedded company summaries with the 'reviews' collection.
+
+    Repairs what failed flush callbacks left behind without the downtime of a migration: every
+    review's metrics are rewritten in place, metrics of reviews that no longer exist are deleted,
+    and when COMPANY_LATEST_REVIEWS > 0 the summaries are rewritten.
+
+    Args:
+        batch_size (int): Number of documents read and written per round trip.
+
+    Returns:
+        tuple: (metrics written, orphaned metrics deleted)
+    """
+    written = 0
+    batch = []
+    for review in review_repository.find({}, {"company_id": 1, "user_id": 1, "rating": 1}).batch_size(batch_size):
+        batch.append(review)
+        if len(batch) >= batch_size:
+            review_metrics_repository.save_many(batch)
+            written += len(batch)
+            batch = []
+    if batch:
+        review_metrics_repository.save_many(batch)
+        written += len(batch)
+
+    deleted = 0
+    ids = []
+    for metric in review_metrics_repository.find({}, {"_id": 1}).batch_size(batch_size):
+        ids.append(metric["_id"])
+        if len(ids) >= batch_size:
+            deleted += _delete_orphaned_metrics(ids)
+            ids = []
+    if ids:
+        deleted += _delete_orphaned_metrics(ids)
+
+    limit = _latest_limit()
+    if limit > 0:
+        _rewrite_latest_reviews(limit, batch_size)
+        company_cache.invalidate()
+    return written, deleted
+
+
+def _delete_orphaned_metrics(ids):
+    existing = {review["_id"] for review in review_repository.find({"_id": {"$in": ids}}, {"_id": 1})}
+    orphaned = [metric_id for metric_id in ids if metric_id not in existing]
+    if orphaned:
+        review_metrics_repository.delete_many({"_id": {"$in": orphaned}})
+    return len(orphaned)
+
+
+def create_compressed_collection(db, name, compressor):
+    """
+    Creates a collection whose WiredTiger blocks are compressed with `compressor`.
+
+    The compressor of a collection is fixed when it is created, so existing collections have to be
+    copied into a new one to change it.
+
+    Args:
+        db (Database): The database.
+        name (str): The collection to create; it must not exist.
+        compressor (str): "zstd", "zlib", "snappy" or "none".
+
+    Returns:
+        Collection: The new collection.
+    """
+    return db.create_collection(
+        name,
+        storageEngine={"wiredTiger": {"configString": f"block_compressor={compressor}"}}
+    )
+
+
+def collection_footprint(db, name):
+    """
+    Reads the storage statistics of a collection.
+
+    Args:
+        db (Database): The database.
+        name (str): The collection.
+
+    Returns:
+        dict or None: Document count and sizes in bytes, or None if the collection does not exist.
+            `size` is the uncompressed data (what the WiredTiger cache holds), `storageSize` the
+            compressed data on disk.
+    """
+    if name not in db.list_collection_names():
+        return None
+    stats = next(db[name].aggregate([{"$collStats": {"storageStats": {}}}]))["storageStats"]
+    creation = stats.get("wiredTiger", {}).get("creationString", "")
+    compressor = next(
+        (option.split("=", 1)[1] for option in creation.split(",") if option.startswith("block_compressor=")),
+        None
+    )
+    return {
+        "count": stats.get("count", 0),
+        "avgObjSize": stats.get("avgObjSize", 0),
+        "size": stats.get("size", 0),
+        "storageSize": stats.get("storageSize", 0),
+        "totalIndexSize": stats.get("totalIndexSize", 0),
+        "compressor": compressor
+    }
+
+
+def storage_report(db):
+    """
+    Reports the storage footprint of the review collections and the working set of each storage mode.
+
+    The footprint of a collection is its compressed data plus its indexes on disk. The working set
+    of a mode is the uncompressed data plus indexes of the collections its rating analytics and
+    company reads touch, since WiredTiger keeps data pages uncompressed in its cache.
+
+    Args:
+        db (Database): The database.
+
+    Returns:
+        dict: {"collections": {name: footprint}, "working_sets": {mode: bytes or None}}
+    """
+    collections = {name: collection_footprint(db, name) for name in REPORTED_COLLECTIONS}
+    for footprint in collections.values():
+        if footprint:
+            footprint["footprint"] = footprint["storageSize"] + footprint["totalIndexSize"]
+
+    working_sets = {}
+    for mode, names in WORKING_SETS.items():
+        if all(collections[name] for name in names):
+            working_sets[mode] = sum(collections[name]["size"] + collections[name]["totalIndexSize"] for name in names)
+        else:
+            working_sets[mode] = None
+    return {"collections": collections, "working_sets": working_sets}
+
+
+def migrate_review_storage(latest=0, compressor="zstd", recompress=True, batch_size=1000):
+    """
+    Converts the existing reviews to compact storage and reports the storage before and after.
+
+    Rebuilds 'review_metrics' in a compressed collection, optionally copies 'reviews' into a
+    compressed collection that replaces it (indexes included), and rewrites the `latest_reviews`
+    summary of every company (removing it when `latest` is 0). Run it while no reviews are being
+    written: reviews stored during the copy are not migrated.
+
+    Args:
+        latest (int): Number of review summaries embedded per company; 0 removes them.
+        compressor (str): Block compressor of the rebuilt collections.
+        recompress (bool): Also rewrite 'reviews' with the compressor.
+        batch_size (int): Number of documents read and written per round trip.
+
+    Returns:
+        tuple: (report before, report after), as returned by `storage_report`.
+    """
+    # Collection-level operations (create, drop, rename, stats) need the database handle
+    db = review_repository.collection.database
+    before = storage_report(db)
+
+    if recompress and before["collections"]["reviews"] and before["collections"]["reviews"]["compressor"] != compressor:
+        _recompress_reviews(db, compressor, batch_size)
+
+    review_metrics_repository.forget_all()
+    review_metrics_repository.collection.drop()
+    metrics = create_compressed_collection(db, review_metrics_repository.collection_name, compressor)
+    batch = []
+    for review in review_repository.find({}, {"company_id": 1, "user_id": 1, "rating": 1}).batch_size(batch_size):
+        batch.append(review_metrics_repository.to_metric(review))
+        if len(batch) >= batch_size:
+            metrics.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        metrics.insert_many(batch, ordered=False)
+    metrics.create_index([("c", ASCENDING)])
+
+    _rewrite_latest_reviews(latest, batch_size)
+    company_cache.invalidate()
+
+    return before, storage_report(db)
+
+
+def _recompress_reviews(db, compressor, batch_size):
+    # Copy into a compressed collection, rebuild the indexes there, then swap it in with a rename
+    db.reviews_compressed.drop()
+    target = create_compressed_collection(db, "reviews_compressed", compressor)
+    batch = []
+    # Whole documents, bypassing the default projection of the repository
+    for review in review_repository.collection.find().batch_size(batch_size):
+        batch.append(review)
+        if len(batch) >= batch_size:
+            target.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        target.insert_many(batch, ordered=False)
+
+    for name, index in review_repository.collection.index_information().items():
+        if name == "_id_":
+            continue
+        options = {key: value for key, value in index.items() if key not in ("key", "v", "ns")}
+        target.create_index(index["key"], name=name, **options)
+    target.rename(review_repository.collection_name, dropTarget=True)
+    review_repository.forget_all()
+
+
+def _rewrite_latest_reviews(latest, batch_size):
+    if latest <= 0:
+        company_repository.update_many({"latest_reviews": {"$exists": True}}, {"$unset": {"latest_reviews": ""}})
+        return
+
+    # Newest first, so each company keeps the first `latest` reviews it meets
+    summaries = {}
+    for review in review_repository.find({}).sort("_id", -1).batch_size(batch_size):
+        entries = summaries.setdefault(to_object_id(review["company_id"]), [])
+        if len(entries) < latest:
+            entries.append(summary_of(review))
+
+    writes = [
+        UpdateOne({"_id": company["_id"]}, {"$set": {"latest_reviews": summaries.get(company["_id"], [])}})
+        for company in company_repository.find({}, {"_id": 1})
+    ]
+    for start in range(0, len(writes), batch_size):
+        company_repository.bulk_write(writes[start:start + batch_size])
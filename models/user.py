@@ -1,5 +1,31 @@
-from extensions import mongo
 from werkzeug.security import generate_password_hash
+from models.repository import Repository
+
+
+class UserRepository(Repository):
+    """
+    Queries on the 'users' collection. Lookups by ID never return the password hash.
+    """
+
+    collection_name = "users"
+    default_projection = {"password": 0}
+
+    def find_by_email(self, email, with_password=False):
+        """
+        Returns the user with the given email.
+
+        Args:
+            email (str): The email address.
+            with_password (bool): Include the password hash, for login.
+
+        Returns:
+            dict or None: The user document, or None if no user has this email.
+        """
+        return self.collection.find_one({"email": email}, None if with_password else self.default_projection)
+
+
+user_repository = UserRepository()
+
 
 def add_user(user_data):
     """
@@ -13,7 +39,7 @@ def add_user(user_data):
     """
     try:
         user_data['password'] = generate_password_hash(user_data['password'])  # Hash the password before storing
-        result = mongo.db.users.insert_one(user_data)
-        return {"success": True, "inserted_id": str(result.inserted_id)}
+        inserted_id = user_repository.insert(user_data)
+        return {"success": True, "inserted_id": str(inserted_id)}
     except Exception as e:
         return {"success": False, "error": str(e)}
@@ -0,0 +1,280 @@
+import atexit
+import os
+import threading
+import time
+from datetime import datetime
+from bson import ObjectId
+from flask import has_app_context
+from pymongo.errors import BulkWriteError
+
+# Collection that receives reviews the server rejected for good (e.g. document validation errors)
+DEAD_LETTER_COLLECTION = "review_dead_letters"
+
+
+class ReviewBufferFull(Exception):
+    """
+    Raised when a review cannot be accepted because the buffer is full and cannot be flushed.
+    """
+
+
+class ReviewWriteBuffer:
+    """
+    Write-behind buffer for review ingestion.
+
+    In "strict" mode every review is inserted synchronously with `insert_one`, exactly as before.
+    In "write_behind" mode reviews are acknowledged with a pre-generated ObjectId, kept in memory
+    and flushed with a single `insert_many` every REVIEW_FLUSH_INTERVAL_MS milliseconds or every
+    REVIEW_FLUSH_BATCH_SIZE documents, whichever comes first. The buffer never holds more than
+    REVIEW_BUFFER_MAX_DOCS reviews, counting a batch that is being written: once it is full the
+    writing request flushes inline, and if that flush fails the review is refused with
+    ReviewBufferFull instead of being acknowledged. An accepted review is only ever dropped from
+    memory once it is stored, or moved to the dead-letter collection when the server rejects it
+    for good.
+
+    Buffered reviews are not visible to reads until they are flushed, and reviews still in memory
+    are lost if the process is killed without a graceful shutdown.
+    """
+
+    def __init__(self, mongo, app=None):
+        self.mongo = mongo
+        self.app = None
+        self.mode = "strict"
+        self.flush_interval = 0.2
+        self.batch_size = 500
+        self.max_docs = 10000
+        self._buffer = []
+        # Reviews taken out of the buffer by a flush that has not finished yet
+        self._in_flight = 0
+        self._listeners = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._thread = None
+        self._pid = None
+        self._closed = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """
+        Reads the buffer settings from the application config and registers the shutdown flush.
+
+        Args:
+            app (Flask): The application whose config and Mongo connection the buffer uses.
+        """
+        app.config.setdefault("REVIEW_WRITE_MODE", "strict")
+        app.config.setdefault("REVIEW_FLUSH_INTERVAL_MS", 200)
+        app.config.setdefault("REVIEW_FLUSH_BATCH_SIZE", 500)
+        app.config.setdefault("REVIEW_BUFFER_MAX_DOCS", 10000)
+
+        mode = app.config["REVIEW_WRITE_MODE"]
+        if mode not in ("strict", "write_behind"):
+            raise ValueError(f"Unknown REVIEW_WRITE_MODE: {mode}")
+
+        self.app = app
+        self.mode = mode
+        self.flush_interval = app.config["REVIEW_FLUSH_INTERVAL_MS"] / 1000.0
+        self.batch_size = max(1, app.config["REVIEW_FLUSH_BATCH_SIZE"])
+        self.max_docs = max(self.batch_size, app.config["REVIEW_BUFFER_MAX_DOCS"])
+        atexit.register(self.close)
+
+    @property
+    def write_behind(self):
+        return self.mode == "write_behind"
+
+    def on_flush(self, callback):
+        """
+        Registers a callback that receives every batch of reviews once it is stored.
+
+        Callbacks are invoked once per flush (or once per review in strict mode), which is where
+        aggregate and statistics updates for the new reviews belong.
+
+        Args:
+            callback (callable): Function taking the list of stored review documents.
+
+        Returns:
+            callable: The callback, so the method can be used as a decorator.
+        """
+        self._listeners.append(callback)
+        return callback
+
+    def add(self, review):
+        """
+        Stores a validated review, either immediately or through the write-behind buffer.
+
+        Args:
+            review (dict): The review document. An `_id` is generated if it does not have one.
+
+        Returns:
+            ObjectId: The `_id` of the review.
+
+        Raises:
+            ReviewBufferFull: The buffer is full and flushing it failed; the review was not accepted.
+        """
+        if not self.write_behind:
+            review["created_at"] = datetime.utcnow()
+            review_id = self._repository().insert(review)
+            self._notify([review])
+            return review_id
+
+        review.setdefault("_id", ObjectId())
+        self._ensure_flusher()
+        if not self._offer(review):
+            # Backpressure: the buffer is full, so this request pays for the flush itself
+            self.flush()
+            if not self._offer(review):
+                raise ReviewBufferFull("Review buffer is full and could not be flushed")
+        return review["_id"]
+
+    def _offer(self, review):
+        # Appends the review unless that would exceed max_docs; wakes the flusher on a full batch
+        with self._lock:
+            pending = len(self._buffer) + self._in_flight
+            if pending >= self.max_docs:
+                return False
+            self._buffer.append(review)
+            if pending + 1 >= self.batch_size:
+                self._wakeup.notify()
+            return True
+
+    def flush(self):
+        """
+        Writes all buffered reviews with `insert_many` and runs the flush callbacks once.
+
+        Returns:
+            int: The number of reviews written.
+        """
+        if self.app is not None and not has_app_context():
+            with self.app.app_context():
+                return self.flush()
+
+        with self._flush_lock:
+            with self._lock:
+                batch, self._buffer = self._buffer, []
+                self._in_flight = len(batch)
+            if not batch:
+                return 0
+
+            # Stamped when written rather than when accepted, so it follows the order reviews become
+            # visible; incremental jobs use it as their watermark (`_id` is generated at acceptance)
+            written_at = datetime.utcnow()
+            for review in batch:
+                review["created_at"] = written_at
+            try:
+                self._repository().insert_many(batch)
+                stored = batch
+            except BulkWriteError as e:
+                # Per-document errors are permanent: duplicate keys mean an earlier attempt already
+                # stored the review, anything else (e.g. validation) will fail again on every retry
+                errors = {error["index"]: error for error in e.details.get("writeErrors", [])}
+                rejected = [(batch[index], error) for index, error in errors.items() if error.get("code") != 11000]
+                stored = [review for index, review in enumerate(batch) if index not in errors or errors[index].get("code") == 11000]
+                self._dead_letter(rejected)
+            except Exception as e:
+                self._requeue(batch)
+                self._log_error(f"Review flush failed: {str(e)}")
+                return 0
+            finally:
+                with self._lock:
+                    self._in_flight = 0
+
+            self._notify(stored)
+            return len(stored)
+
+    def close(self):
+        """
+        Stops the background flusher and writes any reviews that are still buffered.
+        """
+        with self._lock:
+            self._closed = True
+            self._wakeup.notify()
+        if self._thread is not None and self._pid == os.getpid():
+            self._thread.join(timeout=max(1.0, self.flush_interval * 5))
+        self.flush()
+
+    def stats(self):
+        """
+        Returns the current buffer state for monitoring.
+
+        Returns:
+            dict: Mode, number of buffered reviews and configured limits.
+        """
+        with self._lock:
+            pending = len(self._buffer)
+            in_flight = self._in_flight
+        return {
+            "mode": self.mode,
+            "buffered": pending,
+            "in_flight": in_flight,
+            "batch_size": self.batch_size,
+            "max_docs": self.max_docs,
+            "flush_interval_ms": int(self.flush_interval * 1000)
+        }
+
+    def _ensure_flusher(self):
+        # Threads do not survive a fork, so every worker process starts its own flusher
+        if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+                return
+            self._closed = False
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="review-flusher", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                deadline = time.monotonic() + self.flush_interval
+                while not self._closed and len(self._buffer) < self.batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._wakeup.wait(remaining)
+                closed = self._closed
+            if closed:
+                return
+            self.flush()
+
+    @staticmethod
+    def _repository():
+        # Imported on use: the models import the extensions module that creates this buffer
+        from models.review import review_repository
+
+        return review_repository
+
+    def _requeue(self, reviews):
+        # Failed reviews go back to the front of the buffer; they were counted against max_docs
+        # while in flight, so this never exceeds the bound and nothing accepted is dropped
+        with self._lock:
+            self._buffer[:0] = reviews
+
+    def _dead_letter(self, rejected):
+        # Rejected reviews are parked with their error instead of being retried on every flush
+        if not rejected:
+            return
+        self._log_error(f"Review flush rejected {len(rejected)} reviews, moving them to {DEAD_LETTER_COLLECTION}")
+        try:
+            self.mongo.db[DEAD_LETTER_COLLECTION].insert_many(
+                [
+                    {"review": review, "error": {"code": error.get("code"), "message": error.get("errmsg")}}
+                    for review, error in rejected
+                ],
+                ordered=False
+            )
+        except Exception as e:
+            self._log_error(f"Could not store rejected reviews {[str(review['_id']) for review, _ in rejected]}: {str(e)}")
+
+    def _notify(self, reviews):
+        if not reviews:
+            return
+        for callback in self._listeners:
+            try:
+                callback(reviews)
+            except Exception as e:
+                self._log_error(f"Review flush callback failed: {str(e)}")
+
+    def _log_error(self, message):
+        if self.app is not None:
+            self.app.logger.error(message)
@@ -1,12 +1,20 @@
 from flask import Blueprint, request, jsonify
-from extensions import mongo
+from extensions import accomplishment_cache
 from bson import ObjectId
 from flask_jwt_extended import jwt_required
-from utils import role_required
+from utils import apply_derived, role_required
 from datetime import datetime
+from models import company_cube
+from models.accomplishments import accomplishment_repository
+from data_access import read_store
 
 accomplishments_bp = Blueprint('accomplishments', __name__)
 
+
+def _valid_score(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
 # Create an accomplishment (Admin only)
 @accomplishments_bp.route('/companies/<company_id>/accomplishments', methods=['POST'])
 @jwt_required()
@@ -15,6 +23,8 @@ def create_accomplishment(company_id):
     data = request.get_json()
     if not data.get("title"):
         return jsonify({"error": "Accomplishment title is required"}), 400
+    if not _valid_score(data.get("achievement_score", 0)):
+        return jsonify({"error": "Achievement score must be a number"}), 400
 
     accomplishment = {
         "company_id": ObjectId(company_id),
@@ -26,9 +36,11 @@ def create_accomplishment(company_id):
 
     try:
         # Insert accomplishment into database
-        result = mongo.db.accomplishments.insert_one(accomplishment)
+        inserted_id = accomplishment_repository.insert(accomplishment)
+        accomplishment_cache.invalidate(company_id)
+        apply_derived(company_cube.apply_accomplishment, accomplishment["company_id"], accomplishment["achievement_score"], 1)
         # Convert the accomplishment to JSON serializable format
-        accomplishment["_id"] = str(result.inserted_id)
+        accomplishment["_id"] = str(inserted_id)
         accomplishment["company_id"] = str(accomplishment["company_id"])
         return jsonify({"message": "Accomplishment created successfully", "accomplishment": accomplishment}), 201
     except Exception as e:
@@ -38,12 +50,7 @@ def create_accomplishment(company_id):
 @accomplishments_bp.route('/companies/<company_id>/accomplishments', methods=['GET'])
 def get_accomplishments(company_id):
     try:
-        # Ensure company_id is an ObjectId
-        accomplishments = list(mongo.db.accomplishments.find({"company_id": ObjectId(company_id)}))
-        # Convert ObjectIds to strings for JSON serializable format
-        for accomplishment in accomplishments:
-            accomplishment["_id"] = str(accomplishment["_id"])
-            accomplishment["company_id"] = str(accomplishment["company_id"])
+        accomplishments = accomplishment_cache.get(company_id, lambda: read_store.list_accomplishments(company_id))
         return jsonify(accomplishments), 200
     except Exception as e:
         return jsonify({"error": f"Failed to retrieve accomplishments: {str(e)}"}), 500
@@ -55,12 +62,22 @@ def get_accomplishments(company_id):
 def update_accomplishment(accomplishment_id):
     data = request.get_json()
     updated_data = {key: data[key] for key in data if key != "_id"}
+    if "achievement_score" in updated_data and not _valid_score(updated_data["achievement_score"]):
+        return jsonify({"error": "Achievement score must be a number"}), 400
 
     try:
         # Update accomplishment in database
-        result = mongo.db.accomplishments.update_one({"_id": ObjectId(accomplishment_id)}, {"$set": updated_data})
-        if result.matched_count == 0:
+        previous = accomplishment_repository.update(accomplishment_id, updated_data)
+        if not previous:
             return jsonify({"error": "Accomplishment not found"}), 404
+        # The owning company is unknown here, so every cached accomplishment list is dropped
+        accomplishment_cache.invalidate()
+        if "achievement_score" in updated_data:
+            apply_derived(
+                company_cube.apply_accomplishment,
+                previous["company_id"],
+                float(updated_data["achievement_score"]) - float(previous.get("achievement_score", 0))
+            )
         return jsonify({"message": "Accomplishment updated successfully"}), 200
     except Exception as e:
         return jsonify({"error": f"Failed to update accomplishment: {str(e)}"}), 500
@@ -72,9 +89,14 @@ def update_accomplishment(accomplishment_id):
 def delete_accomplishment(accomplishment_id):
     try:
         # Delete accomplishment from database
-        result = mongo.db.accomplishments.delete_one({"_id": ObjectId(accomplishment_id)})
-        if result.deleted_count == 0:
+        accomplishment = accomplishment_repository.delete(accomplishment_id)
+        if not accomplishment:
             return jsonify({"error": "Accomplishment not found"}), 404
+        accomplishment_cache.invalidate()
+        apply_derived(
+            company_cube.apply_accomplishment,
+            accomplishment["company_id"], -float(accomplishment.get("achievement_score", 0)), -1
+        )
         return jsonify({"message": "Accomplishment deleted successfully"}), 200
     except Exception as e:
         return jsonify({"error": f"Failed to delete accomplishment: {str(e)}"}), 500
@@ -1,8 +1,11 @@
 from flask import Blueprint, request, jsonify
-from extensions import mongo
+from extensions import company_cache
 from bson import ObjectId
 from flask_jwt_extended import jwt_required
-from utils import role_required
+from utils import apply_derived, role_required
+from models import company_cube
+from models.company import company_repository
+from data_access import read_store
 
 companies_bp = Blueprint('companies', __name__)
 
@@ -24,8 +27,9 @@ def create_company():
 
     try:
         # Insert new company into database
-        result = mongo.db.companies.insert_one(new_company)
-        new_company["_id"] = str(result.inserted_id)
+        inserted_id = company_repository.insert(new_company)
+        apply_derived(company_cube.add_company, new_company)
+        new_company["_id"] = str(inserted_id)
         return jsonify({"message": "Company created successfully", "company": new_company}), 201
     except Exception as e:
         return jsonify({"error": f"Failed to create company: {str(e)}"}), 500
@@ -34,9 +38,7 @@ def create_company():
 @companies_bp.route('/companies', methods=['GET'])
 def get_companies():
     try:
-        companies = list(mongo.db.companies.find())
-        for company in companies:
-            company["_id"] = str(company["_id"])
+        companies = read_store.list_companies()
         return jsonify(companies), 200
     except Exception as e:
         return jsonify({"error": f"Failed to retrieve companies: {str(e)}"}), 500
@@ -45,14 +47,29 @@ def get_companies():
 @companies_bp.route('/companies/<company_id>', methods=['GET'])
 def get_company(company_id):
     try:
-        company = mongo.db.companies.find_one({"_id": ObjectId(company_id)})
+        company = company_cache.get(company_id, lambda: read_store.get_company(company_id))
         if not company:
             return jsonify({"error": "Company not found"}), 404
-        company["_id"] = str(company["_id"])
         return jsonify(company), 200
     except Exception as e:
         return jsonify({"error": f"Failed to retrieve company: {str(e)}"}), 500
 
+# Retrieve the precomputed most similar companies (based on co-reviews)
+@companies_bp.route('/companies/<company_id>/similar', methods=['GET'])
+def get_similar_companies(company_id):
+    try:
+        limit = min(max(int(request.args.get("limit", 10)), 1), 100)
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+
+    try:
+        similar = read_store.similar_companies(company_id, limit)
+        if similar is None:
+            return jsonify({"error": "No similar companies computed for this company"}), 404
+        return jsonify(similar), 200
+    except Exception as e:
+        return jsonify({"error": f"Failed to retrieve similar companies: {str(e)}"}), 500
+
 # Update a company (Admin only)
 @companies_bp.route('/companies/<company_id>', methods=['PUT'])
 @jwt_required()
@@ -63,9 +80,12 @@ def update_company(company_id):
 
     try:
         # Update company details in database
-        result = mongo.db.companies.update_one({"_id": ObjectId(company_id)}, {"$set": updated_data})
-        if result.matched_count == 0:
+        previous = company_repository.update(company_id, updated_data)
+        if not previous:
             return jsonify({"error": "Company not found"}), 404
+        company_cache.invalidate(company_id)
+        if any(field in updated_data for field in ("industry", "location", "founded")):
+            apply_derived(company_cube.move_company, dict(previous, **updated_data))
         return jsonify({"message": "Company updated successfully"}), 200
     except Exception as e:
         return jsonify({"error": f"Failed to update company: {str(e)}"}), 500
@@ -77,9 +97,10 @@ def update_company(company_id):
 def delete_company(company_id):
     try:
         # Delete company from database
-        result = mongo.db.companies.delete_one({"_id": ObjectId(company_id)})
-        if result.deleted_count == 0:
+        if not company_repository.delete(company_id):
             return jsonify({"error": "Company not found"}), 404
+        company_cache.invalidate(company_id)
+        apply_derived(company_cube.remove_company, ObjectId(company_id))
         return jsonify({"message": "Company deleted successfully"}), 200
     except Exception as e:
         return jsonify({"error": f"Failed to delete company: {str(e)}"}), 500
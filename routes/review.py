@@ -1,8 +1,12 @@
 from flask import Blueprint, request, jsonify
-from extensions import mongo
+from extensions import review_buffer
+from review_buffer import ReviewBufferFull
 from bson import ObjectId
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from utils import role_required
+from utils import apply_derived, role_required
+from models import company_cube, company_sketch, review_storage
+from models.review import is_valid_rating, review_repository
+from data_access import read_store
 
 reviews_bp = Blueprint('reviews', __name__)
 
@@ -11,8 +15,10 @@ reviews_bp = Blueprint('reviews', __name__)
 @jwt_required()
 def create_review(company_id):
     data = request.get_json()
-    if not data.get("rating"):
+    if data.get("rating") is None:
         return jsonify({"error": "Rating is required"}), 400
+    if not is_valid_rating(data["rating"]):
+        return jsonify({"error": "Rating must be a number between 0 and 5"}), 400
 
     review = {
         "user_id": ObjectId(get_jwt_identity()),
@@ -22,13 +28,23 @@ def create_review(company_id):
     }
 
     try:
-        # Insert review into database
-        result = mongo.db.reviews.insert_one(review)
-        # Convert the review to JSON serializable format
-        review["_id"] = str(result.inserted_id)
-        review["user_id"] = str(review["user_id"])
-        review["company_id"] = str(review["company_id"])
+        # Insert review into database, or queue it for the next batch in write-behind mode
+        review_id = review_buffer.add(review)
+        # Built from the submitted fields only: the buffer stamps `created_at` on the stored document,
+        # in write-behind mode whenever the flush happens to run
+        review = {
+            "user_id": str(review["user_id"]),
+            "company_id": str(review["company_id"]),
+            "rating": review["rating"],
+            "review_text": review["review_text"],
+            "_id": str(review_id)
+        }
+        if review_buffer.write_behind:
+            return jsonify({"message": "Review accepted", "review": review}), 202
         return jsonify({"message": "Review created successfully", "review": review}), 201
+    except ReviewBufferFull:
+        # Nothing was stored, so the client can safely retry
+        return jsonify({"error": "Review service is temporarily unavailable, please retry"}), 503, {"Retry-After": "1"}
     except Exception as e:
         return jsonify({"error": f"Failed to create review: {str(e)}"}), 500
 
@@ -38,13 +54,7 @@ def create_review(company_id):
 @reviews_bp.route('/companies/<company_id>/reviews', methods=['GET'])
 def get_reviews(company_id):
     try:
-        # Ensure company_id is an ObjectId
-        reviews = list(mongo.db.reviews.find({"company_id": ObjectId(company_id)}))
-        # Convert ObjectIds to strings for JSON serializable format
-        for review in reviews:
-            review["_id"] = str(review["_id"])
-            review["company_id"] = str(review["company_id"])
-            review["user_id"] = str(review["user_id"])
+        reviews = read_store.list_reviews(company_id)
         return jsonify(reviews), 200
     except Exception as e:
         return jsonify({"error": f"Failed to retrieve reviews: {str(e)}"}), 500
@@ -55,9 +65,11 @@ def get_reviews(company_id):
 def update_review(review_id):
     user_id = get_jwt_identity()
     data = request.get_json()
-    
+    if "rating" in data and not is_valid_rating(data["rating"]):
+        return jsonify({"error": "Rating must be a number between 0 and 5"}), 400
+
     try:
-        review = mongo.db.reviews.find_one({"_id": ObjectId(review_id)})
+        review = review_repository.get(review_id)
         if not review:
             return jsonify({"error": "Review not found"}), 404
         
@@ -71,7 +83,11 @@ def update_review(review_id):
         }
 
         # Update review in database
-        mongo.db.reviews.update_one({"_id": ObjectId(review_id)}, {"$set": updated_data})
+        review_repository.update(review_id, updated_data)
+        if updated_data["rating"] != review["rating"]:
+            apply_derived(company_sketch.update_rating, review["company_id"], review["rating"], updated_data["rating"])
+            apply_derived(company_cube.update_rating, review["company_id"], review["rating"], updated_data["rating"])
+        apply_derived(review_storage.update_review, review, updated_data)
         return jsonify({"message": "Review updated successfully"}), 200
     except Exception as e:
         return jsonify({"error": f"Failed to update review: {str(e)}"}), 500
@@ -83,9 +99,12 @@ def update_review(review_id):
 def delete_review(review_id):
     try:
         # Delete review from database
-        result = mongo.db.reviews.delete_one({"_id": ObjectId(review_id)})
-        if result.deleted_count == 0:
+        review = review_repository.delete(review_id)
+        if not review:
             return jsonify({"error": "Review not found"}), 404
+        apply_derived(company_sketch.remove_review, review)
+        apply_derived(company_cube.remove_review, review)
+        apply_derived(review_storage.remove_review, review)
         return jsonify({"message": "Review deleted successfully"}), 200
     except Exception as e:
         return jsonify({"error": f"Failed to delete review: {str(e)}"}), 500
@@ -1,6 +1,6 @@
-from bson import ObjectId
 from flask import Blueprint, request, jsonify
-from extensions import mongo
+from models.user import user_repository
+from data_access import read_store
 from flask_jwt_extended import create_access_token, get_jwt_identity, jwt_required
 from werkzeug.security import check_password_hash, generate_password_hash
 
@@ -22,12 +22,12 @@ def register_user():
         }
 
         # Check for existing email in database
-        if mongo.db.users.find_one({"email": new_user["email"]}):
+        if user_repository.find_by_email(new_user["email"]):
             return jsonify({"error": "Email already in use"}), 409
 
         # Insert new user
-        result = mongo.db.users.insert_one(new_user)
-        return jsonify({"message": "User registered successfully", "user_id": str(result.inserted_id)}), 201
+        inserted_id = user_repository.insert(new_user)
+        return jsonify({"message": "User registered successfully", "user_id": str(inserted_id)}), 201
     except Exception as e:
         return jsonify({"error": f"Registration failed: {str(e)}"}), 500
 
@@ -38,7 +38,7 @@ def login_user():
     
     try:
         # Find user by email
-        user = mongo.db.users.find_one({"email": data["email"]})
+        user = user_repository.find_by_email(data["email"], with_password=True)
 
         # Validate password
         if user and check_password_hash(user["password"], data["password"]):
@@ -57,12 +57,11 @@ def get_profile():
     try:
         # Retrieve current user's profile excluding password
         current_user_id = get_jwt_identity()
-        user = mongo.db.users.find_one({"_id": ObjectId(current_user_id)}, {"password": 0})
+        user = read_store.get_user_profile(current_user_id)
 
         if not user:
             return jsonify({"error": "User not found"}), 404
 
-        user["_id"] = str(user["_id"])
         return jsonify(user), 200
     except Exception as e:
         return jsonify({"error": f"Failed to retrieve profile: {str(e)}"}), 500
@@ -0,0 +1,128 @@
+import numpy as np
+from scipy import sparse
+
+
+class RatingMatrixBuilder:
+    """
+    Accumulates (user, company, rating) triples chunk by chunk into a sparse user x company matrix.
+
+    Only compact integer indexes and float32 ratings are kept per review (12 bytes), so millions
+    of reviews fit in bounded memory regardless of how large the source documents are.
+    """
+
+    def __init__(self):
+        self.user_index = {}
+        self.company_index = {}
+        self._rows = []
+        self._cols = []
+        self._ratings = []
+
+    def add_chunk(self, reviews):
+        """
+        Adds one chunk of reviews.
+
+        Args:
+            reviews (list): Dicts with `user_id`, `company_id` and `rating`.
+        """
+        rows = np.empty(len(reviews), dtype=np.int32)
+        cols = np.empty(len(reviews), dtype=np.int32)
+        ratings = np.empty(len(reviews), dtype=np.float32)
+        for position, review in enumerate(reviews):
+            rows[position] = self.user_index.setdefault(str(review["user_id"]), len(self.user_index))
+            cols[position] = self.company_index.setdefault(str(review["company_id"]), len(self.company_index))
+            ratings[position] = review["rating"]
+        self._rows.append(rows)
+        self._cols.append(cols)
+        self._ratings.append(ratings)
+
+    def build(self):
+        """
+        Builds the mean-centered rating matrix (see `centered_matrix`).
+
+        Returns:
+            csr_matrix: Users x companies matrix of centered ratings.
+        """
+        shape = (len(self.user_index), len(self.company_index))
+        rows = np.concatenate(self._rows) if self._rows else np.empty(0, dtype=np.int32)
+        cols = np.concatenate(self._cols) if self._cols else np.empty(0, dtype=np.int32)
+        ratings = np.concatenate(self._ratings) if self._ratings else np.empty(0, dtype=np.float32)
+        self._rows, self._cols, self._ratings = [], [], []
+        return centered_matrix(rows, cols, ratings, shape)
+
+
+def centered_matrix(rows, cols, ratings, shape):
+    """
+    Builds the mean-centered rating matrix from parallel arrays of user rows, company columns and ratings.
+
+    A user who reviewed a company several times contributes the mean of those ratings, and
+    every rating is centered on the mean rating of its user (adjusted cosine).
+
+    Args:
+        rows (ndarray): User row of every rating.
+        cols (ndarray): Company column of every rating.
+        ratings (ndarray): The ratings.
+        shape (tuple): (number of users, number of companies).
+
+    Returns:
+        csr_matrix: Users x companies matrix of centered ratings.
+    """
+    totals = sparse.csr_matrix((ratings.astype(np.float64), (rows, cols)), shape=shape)
+    counts = sparse.csr_matrix((np.ones(len(ratings)), (rows, cols)), shape=shape)
+    matrix = totals.copy()
+    matrix.data = totals.data / counts.data
+
+    entries_per_user = np.diff(matrix.indptr)
+    user_means = np.asarray(matrix.sum(axis=1)).ravel() / np.maximum(entries_per_user, 1)
+    matrix.data -= np.repeat(user_means, entries_per_user)
+    matrix.eliminate_zeros()
+    return matrix
+
+
+def top_k_similar(matrix, k, columns=None, max_block_cells=16_000_000):
+    """
+    Computes the K most similar companies (cosine on centered ratings) for each requested column.
+
+    Similarities are computed for blocks of columns at a time so the dense block never holds
+    more than `max_block_cells` scores.
+
+    Args:
+        matrix (csr_matrix): Users x companies matrix from `RatingMatrixBuilder.build`.
+        k (int): Number of neighbours to keep per company.
+        columns (array-like, optional): Company column indexes to compute; all by default.
+        max_block_cells (int): Upper bound on the size of one dense score block.
+
+    Returns:
+        dict: Column index -> list of (neighbour column index, score), best first. Only
+              neighbours with a positive similarity are kept, so the list can be shorter than K.
+    """
+    matrix = sparse.csc_matrix(matrix)
+    n_companies = matrix.shape[1]
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=0)).ravel())
+    inverse = np.divide(1.0, norms, out=np.zeros_like(norms), where=norms > 0)
+    normalized = sparse.csc_matrix(matrix @ sparse.diags(inverse))
+    transposed = normalized.T.tocsr()
+
+    if columns is None:
+        columns = np.arange(n_companies)
+    columns = np.asarray(columns, dtype=np.int64)
+    block_size = max(1, max_block_cells // max(n_companies, 1))
+
+    neighbours = {}
+    for start in range(0, len(columns), block_size):
+        block = columns[start:start + block_size]
+        scores = (transposed @ normalized[:, block]).toarray()
+        scores[block, np.arange(len(block))] = -np.inf
+        keep = min(k, n_companies - 1)
+        if keep <= 0:
+            neighbours.update({int(column): [] for column in block})
+            continue
+        candidates = np.argpartition(-scores, keep - 1, axis=0)[:keep]
+        for position, column in enumerate(block):
+            top = candidates[:, position]
+            top = top[np.argsort(-scores[top, position])]
+            neighbours[int(column)] = [
+                (int(other), float(scores[other, position]))
+                for other in top
+                if scores[other, position] > 0
+            ]
+    return neighbours
@@ -0,0 +1,184 @@
+import hashlib
+import math
+
+
+class HyperLogLog:
+    """
+    HyperLogLog sketch for counting distinct values.
+
+    With the default precision of 12 the sketch has 4096 registers and a relative standard
+    error of 1.04 / sqrt(4096), about 1.6%. Registers are stored sparsely as {"index": rank},
+    so two sketches merge by taking the per-register maximum (MongoDB `$max` does the same),
+    or densely as one byte per register once the sparse form outgrows `sparse_limit`.
+    Values cannot be removed once added.
+    """
+
+    def __init__(self, precision=12, registers=None, dense=None):
+        self.precision = precision
+        self.size = 1 << precision
+        self.registers = bytearray(dense) if dense else bytearray(self.size)
+        if len(self.registers) != self.size:
+            raise ValueError("Dense HyperLogLog registers do not match the precision")
+        for index, rank in (registers or {}).items():
+            self.registers[int(index)] = max(self.registers[int(index)], int(rank))
+
+    @staticmethod
+    def register_for(value, precision=12):
+        """
+        Computes the register index and rank that `value` updates.
+
+        Args:
+            value: The value to count, converted with `str` (e.g. an ObjectId).
+            precision (int): Number of index bits.
+
+        Returns:
+            tuple: (register index, rank)
+        """
+        digest = hashlib.blake2b(str(value).encode("utf-8"), digest_size=8).digest()
+        hashed = int.from_bytes(digest, "big")
+        index = hashed >> (64 - precision)
+        remaining = hashed & ((1 << (64 - precision)) - 1)
+        rank = (64 - precision) - remaining.bit_length() + 1
+        return index, rank
+
+    @property
+    def relative_error(self):
+        return 1.04 / math.sqrt(self.size)
+
+    @property
+    def sparse_limit(self):
+        # A sparse register costs about 10 BSON bytes (type, "index" key, int32) against 1 byte
+        # dense, so past size / 10 registers the dense form is smaller
+        return self.size // 10
+
+    def add(self, value):
+        index, rank = self.register_for(value, self.precision)
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other):
+        """
+        Merges another sketch with the same precision into this one.
+
+        Args:
+            other (HyperLogLog): The sketch to merge.
+
+        Returns:
+            HyperLogLog: This sketch.
+        """
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge HyperLogLog sketches with different precision")
+        if self.registers.count(0) == self.size:
+            self.registers = bytearray(other.registers)
+        else:
+            self.registers = bytearray(map(max, self.registers, other.registers))
+        return self
+
+    def count(self):
+        """
+        Estimates the number of distinct values added to the sketch.
+
+        Returns:
+            int: The estimated distinct count.
+        """
+        m = self.size
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -rank for rank in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            # Linear counting is more accurate while many registers are still empty
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+    def to_document(self):
+        """
+        Returns the non-empty registers in the sparse form stored in MongoDB.
+
+        Returns:
+            dict: Mapping of register index (str) to rank.
+        """
+        return {str(index): rank for index, rank in enumerate(self.registers) if rank}
+
+    def to_bytes(self):
+        """
+        Returns the registers in the dense form stored in MongoDB, one byte per register.
+
+        Returns:
+            bytes: The registers.
+        """
+        return bytes(self.registers)
+
+    @property
+    def occupied(self):
+        return self.size - self.registers.count(0)
+
+
+class RatingHistogram:
+    """
+    Fixed-resolution histogram used as a mergeable quantile sketch for ratings.
+
+    Ratings are bounded, so bucketing them at RESOLUTION gives quantiles whose value error is
+    at most RESOLUTION / 2 (0.05 stars) with no rank error, using at most 51 counters per
+    company. Ratings outside [MIN_RATING, MAX_RATING] are clamped. Histograms merge by adding
+    counts, and removing a rating is a decrement.
+    """
+
+    MIN_RATING = 0.0
+    MAX_RATING = 5.0
+    RESOLUTION = 0.1
+
+    def __init__(self, buckets=None):
+        self.buckets = {}
+        for bucket, count in (buckets or {}).items():
+            if count:
+                self.buckets[int(bucket)] = self.buckets.get(int(bucket), 0) + int(count)
+
+    @classmethod
+    def bucket_for(cls, rating):
+        rating = min(max(float(rating), cls.MIN_RATING), cls.MAX_RATING)
+        return int(round((rating - cls.MIN_RATING) / cls.RESOLUTION))
+
+    @classmethod
+    def value_for(cls, bucket):
+        return round(cls.MIN_RATING + bucket * cls.RESOLUTION, 2)
+
+    @property
+    def max_error(self):
+        return self.RESOLUTION / 2
+
+    @property
+    def total(self):
+        return sum(self.buckets.values())
+
+    def add(self, rating, count=1):
+        bucket = self.bucket_for(rating)
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + count
+
+    def merge(self, other):
+        for bucket, count in other.buckets.items():
+            self.buckets[bucket] = self.buckets.get(bucket, 0) + count
+        return self
+
+    def quantile(self, q):
+        """
+        Returns the rating at quantile `q` (nearest-rank method).
+
+        Args:
+            q (float): Quantile between 0 and 1.
+
+        Returns:
+            float or None: The rating, or None when the histogram is empty.
+        """
+        total = self.total
+        if total <= 0:
+            return None
+        rank = max(1, math.ceil(q * total))
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                return self.value_for(bucket)
+        return self.value_for(max(self.buckets))
+
+    def to_document(self):
+        return {str(bucket): count for bucket, count in self.buckets.items() if count}
@@ -0,0 +1,552 @@
+import json
+import os
+import numpy as np
+from sketches import HyperLogLog, RatingHistogram
+
+# Offline snapshot engine: serves the read API from JSON/NDJSON exports without MongoDB.
+#
+# Every collection is converted once into column arrays saved as .npy files in the cache
+# directory, together with the per-company aggregates computed from them. Later startups
+# memory-map those files instead of parsing JSON and recomputing, so load time does not grow
+# with the snapshot size and pages are only read when a query touches them.
+
+COLLECTIONS = ("companies", "reviews", "accomplishments", "users")
+SOURCE_EXTENSIONS = (".json", ".ndjson", ".jsonl")
+CACHE_FORMAT = 2
+
+# Columns holding 24-character ObjectId strings, stored fixed-width for sorting and searching
+ID_FIELDS = ("_id", "company_id", "user_id")
+# Indexes for one-to-many lookups: collection -> foreign key fields
+GROUP_INDEXES = {
+    "reviews": ("company_id",),
+    "accomplishments": ("company_id",)
+}
+
+
+def _read_records(path):
+    with open(path, encoding="utf-8") as f:
+        if path.endswith(".json"):
+            return json.load(f)
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _id_string(value):
+    if isinstance(value, dict) and "$oid" in value:
+        # Extended JSON, as written by mongoexport
+        return value["$oid"]
+    return "" if value is None else str(value)
+
+
+class Column:
+    """
+    One field of a collection: a values array plus a mask of the rows that have the field.
+
+    `kind` is "id" (fixed-width ObjectId strings), "int", "float", "str" (UTF-8 bytes with an
+    offsets array) or "json" (JSON-encoded values for anything else).
+    """
+
+    def __init__(self, kind, values, present, offsets=None):
+        self.kind = kind
+        self.values = values
+        self.present = present
+        self.offsets = offsets
+
+    @classmethod
+    def from_values(cls, field, values):
+        present = np.array([value is not None for value in values], dtype=bool)
+        kinds = {type(value) for value in values if value is not None}
+        if field in ID_FIELDS:
+            return cls("id", np.array([_id_string(value) for value in values], dtype="S24"), present)
+        if kinds and kinds <= {int}:
+            return cls("int", np.array([value or 0 for value in values], dtype=np.int64), present)
+        if kinds and kinds <= {int, float}:
+            return cls("float", np.array([np.nan if value is None else value for value in values], dtype=np.float64), present)
+
+        kind = "str" if kinds <= {str} else "json"
+        encoded = [
+            (value if kind == "str" else json.dumps(value)).encode("utf-8") if value is not None else b""
+            for value in values
+        ]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(item) for item in encoded], out=offsets[1:])
+        data = np.frombuffer(b"".join(encoded), dtype=np.uint8) if encoded else np.empty(0, dtype=np.uint8)
+        return cls(kind, data, present, offsets)
+
+    def get(self, row):
+        if not self.present[row]:
+            return None
+        if self.kind == "id":
+            return self.values[row].decode("ascii")
+        if self.kind == "int":
+            return int(self.values[row])
+        if self.kind == "float":
+            return float(self.values[row])
+        raw = self.values[self.offsets[row]:self.offsets[row + 1]].tobytes().decode("utf-8")
+        return raw if self.kind == "str" else json.loads(raw)
+
+    def strings(self, rows=None):
+        """
+        Decodes the column into a list of Python values, for small tables such as companies.
+        """
+        rows = range(len(self.present)) if rows is None else rows
+        return [self.get(row) for row in rows]
+
+    def arrays(self):
+        arrays = {"values": self.values, "present": self.present}
+        if self.offsets is not None:
+            arrays["offsets"] = self.offsets
+        return arrays
+
+
+class Table:
+    """
+    A collection stored column-wise, with a sorted `_id` index and optional foreign-key indexes.
+    """
+
+    def __init__(self, name, columns, order, sorted_ids, group_orders):
+        self.name = name
+        self.columns = columns
+        self.size = len(columns["_id"].values)
+        # `order` sorts the rows by _id, so lookups are a binary search over `sorted_ids`
+        self.order = order
+        self.sorted_ids = sorted_ids
+        # field -> (rows sorted by that field, the sorted keys)
+        self.group_orders = group_orders
+
+    @classmethod
+    def from_records(cls, name, records):
+        fields = []
+        for record in records:
+            for field in record:
+                if field not in fields:
+                    fields.append(field)
+        columns = {field: Column.from_values(field, [record.get(field) for record in records]) for field in fields}
+        if "_id" not in columns:
+            columns["_id"] = Column.from_values("_id", [None] * len(records))
+        order = np.argsort(columns["_id"].values, kind="stable")
+        group_orders = {}
+        for field in GROUP_INDEXES.get(name, ()):
+            if field in columns:
+                rows = np.argsort(columns[field].values, kind="stable")
+                group_orders[field] = (rows, columns[field].values[rows])
+        return cls(name, columns, order, columns["_id"].values[order], group_orders)
+
+    def find(self, document_id):
+        key = str(document_id).encode("ascii")
+        position = np.searchsorted(self.sorted_ids, key)
+        if position < self.size and self.sorted_ids[position] == key:
+            return int(self.order[position])
+        return None
+
+    def rows_for(self, field, key):
+        """
+        Returns the rows whose `field` equals `key`, using the foreign-key index.
+        """
+        if field not in self.group_orders:
+            return np.empty(0, dtype=np.int64)
+        rows, keys = self.group_orders[field]
+        key = str(key).encode("ascii")
+        start = np.searchsorted(keys, key, side="left")
+        end = np.searchsorted(keys, key, side="right")
+        return np.sort(rows[start:end])
+
+    def row(self, row, exclude=()):
+        document = {}
+        for field, column in self.columns.items():
+            if field in exclude or not column.present[row]:
+                continue
+            document[field] = column.get(row)
+        return document
+
+    def save(self, directory):
+        manifest = {"columns": {}, "groups": list(self.group_orders)}
+        np.save(os.path.join(directory, f"{self.name}.order.npy"), self.order)
+        np.save(os.path.join(directory, f"{self.name}.sorted_ids.npy"), self.sorted_ids)
+        for field, (rows, keys) in self.group_orders.items():
+            np.save(os.path.join(directory, f"{self.name}.group.{field}.npy"), rows)
+            np.save(os.path.join(directory, f"{self.name}.group.{field}.keys.npy"), keys)
+        for index, (field, column) in enumerate(self.columns.items()):
+            manifest["columns"][field] = {"kind": column.kind, "file": f"{self.name}.{index}"}
+            for part, array in column.arrays().items():
+                np.save(os.path.join(directory, f"{self.name}.{index}.{part}.npy"), array)
+        return manifest
+
+    @classmethod
+    def open(cls, name, directory, manifest):
+        def load(filename):
+            return np.load(os.path.join(directory, filename), mmap_mode="r")
+
+        columns = {}
+        for field, spec in manifest["columns"].items():
+            offsets = load(f"{spec['file']}.offsets.npy") if spec["kind"] in ("str", "json") else None
+            columns[field] = Column(spec["kind"], load(f"{spec['file']}.values.npy"), load(f"{spec['file']}.present.npy"), offsets)
+        group_orders = {}
+        for field in manifest["groups"]:
+            group_orders[field] = (load(f"{name}.group.{field}.npy"), load(f"{name}.group.{field}.keys.npy"))
+        return cls(name, columns, load(f"{name}.order.npy"), load(f"{name}.sorted_ids.npy"), group_orders)
+
+
+class Snapshot:
+    """
+    The four collections of a snapshot, plus per-company aggregates.
+
+    Everything the read API derives from the reviews is computed here: counts and sums, reviewer
+    sketches, rating histograms and the similar-companies lists. They are computed once when the
+    cache is built and memory-mapped from it afterwards, so no startup or request pays for them.
+    """
+
+    # Neighbours kept per company, as the refresh-similar command does by default
+    SIMILAR_K = 20
+    # Arrays saved in the cache next to the column files
+    AGGREGATES = (
+        "review_company", "accomplishment_company", "ratings", "scores",
+        "review_count", "rating_sum", "average_rating", "accomplishment_count", "accomplishment_score_sum",
+        "rating_buckets", "register_index", "register_rank", "register_offsets",
+        "similar_offsets", "similar_rows", "similar_scores"
+    )
+
+    def __init__(self, tables, aggregates=None):
+        self.companies = tables["companies"]
+        self.reviews = tables["reviews"]
+        self.accomplishments = tables["accomplishments"]
+        self.users = tables["users"]
+        if aggregates is None:
+            self._compute_aggregates()
+        else:
+            for name, array in aggregates.items():
+                setattr(self, name, array)
+
+    @classmethod
+    def load(cls, directory, cache_directory=None):
+        """
+        Loads a snapshot, converting the JSON/NDJSON sources to memory-mapped columns on first use.
+
+        The cache is rebuilt whenever a source file changes (size or modification time).
+
+        Args:
+            directory (str): Directory holding companies, reviews, accomplishments and users exports.
+            cache_directory (str, optional): Where the column files are kept. Defaults to
+                                             `<directory>/.snapshot_cache`.
+
+        Returns:
+            Snapshot: The loaded snapshot.
+        """
+        cache_directory = cache_directory or os.path.join(directory, ".snapshot_cache")
+        sources = {}
+        for name in COLLECTIONS:
+            for extension in SOURCE_EXTENSIONS:
+                path = os.path.join(directory, name + extension)
+                if os.path.exists(path):
+                    stat = os.stat(path)
+                    sources[name] = {"path": path, "size": stat.st_size, "mtime": stat.st_mtime}
+                    break
+
+        manifest_path = os.path.join(cache_directory, "manifest.json")
+        manifest = None
+        if os.path.exists(manifest_path):
+            with open(manifest_path, encoding="utf-8") as f:
+                manifest = json.load(f)
+            if manifest.get("format") != CACHE_FORMAT or manifest.get("sources") != sources:
+                manifest = None
+
+        if manifest is not None:
+            return cls(
+                {name: Table.open(name, cache_directory, manifest["tables"][name]) for name in COLLECTIONS},
+                {
+                    name: np.load(os.path.join(cache_directory, filename), mmap_mode="r")
+                    for name, filename in manifest["aggregates"].items()
+                }
+            )
+
+        os.makedirs(cache_directory, exist_ok=True)
+        manifest = {"format": CACHE_FORMAT, "sources": sources, "tables": {}, "aggregates": {}}
+        for name in COLLECTIONS:
+            records = _read_records(sources[name]["path"]) if name in sources else []
+            manifest["tables"][name] = Table.from_records(name, records).save(cache_directory)
+        snapshot = cls({name: Table.open(name, cache_directory, manifest["tables"][name]) for name in COLLECTIONS})
+        for name in cls.AGGREGATES:
+            manifest["aggregates"][name] = f"aggregate.{name}.npy"
+            np.save(os.path.join(cache_directory, manifest["aggregates"][name]), getattr(snapshot, name))
+        # The manifest is written last, so an interrupted build is never taken for a valid cache
+        with open(manifest_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        return snapshot
+
+    def _compute_aggregates(self):
+        # Map every review / accomplishment to the row of its company with one vectorized search
+        companies = self.companies
+        self.review_company = self._company_rows(self.reviews)
+        self.accomplishment_company = self._company_rows(self.accomplishments)
+
+        ratings = self._numbers(self.reviews, "rating")
+        rated = (self.review_company >= 0) & ~np.isnan(ratings)
+        self.review_count = np.bincount(self.review_company[rated], minlength=companies.size)
+        rating_sum = np.bincount(self.review_company[rated], weights=ratings[rated], minlength=companies.size)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            self.average_rating = np.where(self.review_count > 0, rating_sum / np.maximum(self.review_count, 1), np.nan)
+        self.rating_sum = rating_sum
+        self.ratings = ratings
+
+        linked = self.accomplishment_company >= 0
+        self.accomplishment_count = np.bincount(self.accomplishment_company[linked], minlength=companies.size)
+        scores = self._numbers(self.accomplishments, "achievement_score")
+        scored = linked & ~np.isnan(scores)
+        self.accomplishment_score_sum = np.bincount(
+            self.accomplishment_company[scored], weights=scores[scored], minlength=companies.size
+        )
+        self.scores = scores
+
+        self._compute_sketches()
+        self._compute_similar()
+
+    def _compute_sketches(self):
+        companies = self.companies
+        rated = (self.review_company >= 0) & ~np.isnan(self.ratings)
+
+        # Rating histogram of every company, one row of RatingHistogram buckets per company
+        buckets = RatingHistogram.bucket_for(RatingHistogram.MAX_RATING) + 1
+        values = np.clip(self.ratings[rated], RatingHistogram.MIN_RATING, RatingHistogram.MAX_RATING)
+        self.rating_buckets = np.zeros((companies.size, buckets), dtype=np.int64)
+        np.add.at(
+            self.rating_buckets,
+            (self.review_company[rated], np.rint((values - RatingHistogram.MIN_RATING) / RatingHistogram.RESOLUTION).astype(np.int64)),
+            1
+        )
+
+        # HyperLogLog registers of every company as (register, rank) pairs grouped by company row;
+        # each distinct reviewer is hashed once
+        size = HyperLogLog().size
+        self.register_index = np.zeros(0, dtype=np.int64)
+        self.register_rank = np.zeros(0, dtype=np.uint8)
+        self.register_offsets = np.zeros(companies.size + 1, dtype=np.int64)
+        users = self.reviews.columns.get("user_id")
+        if users is None:
+            return
+        linked = np.flatnonzero((self.review_company >= 0) & users.present)
+        if not len(linked):
+            return
+        distinct, inverse = np.unique(users.values[linked], return_inverse=True)
+        pairs = np.array([HyperLogLog.register_for(user_id.decode("ascii")) for user_id in distinct], dtype=np.int64)
+        keys = self.review_company[linked] * size + pairs[inverse, 0]
+        ranks = pairs[inverse, 1]
+        # Keep the highest rank of every (company, register)
+        order = np.lexsort((-ranks, keys))
+        keys, ranks = keys[order], ranks[order]
+        first = np.ones(len(keys), dtype=bool)
+        first[1:] = keys[1:] != keys[:-1]
+        keys, ranks = keys[first], ranks[first]
+        self.register_index = keys % size
+        self.register_rank = ranks.astype(np.uint8)
+        self.register_offsets = np.searchsorted(keys // size, np.arange(companies.size + 1))
+
+    def _compute_similar(self):
+        from similarity import centered_matrix, top_k_similar
+
+        # Neighbours of every company as (company row, score) pairs grouped by company row
+        companies = self.companies.size
+        self.similar_offsets = np.zeros(companies + 1, dtype=np.int64)
+        self.similar_rows = np.zeros(0, dtype=np.int64)
+        self.similar_scores = np.zeros(0, dtype=np.float64)
+        rated = np.flatnonzero((self.review_company >= 0) & ~np.isnan(self.ratings))
+        users = self.reviews.columns.get("user_id")
+        if users is None or not len(rated):
+            return
+        # Users x company rows matrix, built straight from the columns
+        distinct, user_rows = np.unique(users.values[rated], return_inverse=True)
+        matrix = centered_matrix(user_rows, self.review_company[rated], self.ratings[rated], (len(distinct), companies))
+        similar = top_k_similar(matrix, self.SIMILAR_K)
+        np.cumsum([len(similar[row]) for row in range(companies)], out=self.similar_offsets[1:])
+        self.similar_rows = np.array([other for row in range(companies) for other, _ in similar[row]], dtype=np.int64)
+        self.similar_scores = np.array([score for row in range(companies) for _, score in similar[row]], dtype=np.float64)
+
+    def _company_rows(self, table):
+        if table.size == 0 or "company_id" not in table.columns or self.companies.size == 0:
+            return np.full(table.size, -1, dtype=np.int64)
+        keys = table.columns["company_id"].values
+        positions = np.minimum(np.searchsorted(self.companies.sorted_ids, keys), self.companies.size - 1)
+        found = self.companies.sorted_ids[positions] == keys
+        return np.where(found, self.companies.order[positions], -1).astype(np.int64)
+
+    @staticmethod
+    def _numbers(table, field):
+        column = table.columns.get(field)
+        if column is None or column.kind not in ("int", "float"):
+            return np.full(table.size, np.nan)
+        return np.where(column.present, column.values.astype(np.float64), np.nan)
+
+
+class SnapshotReadStore:
+    """
+    Read operations of the API served from a Snapshot; the same interface as data_access.MongoReadStore.
+    """
+
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+
+    def _company_row(self, company_id):
+        return self.snapshot.companies.find(company_id)
+
+    def _summary(self, row, **fields):
+        companies = self.snapshot.companies
+        summary = {"_id": companies.columns["_id"].get(row)}
+        if "name" in companies.columns and companies.columns["name"].present[row]:
+            summary["name"] = companies.columns["name"].get(row)
+        summary.update(fields)
+        return summary
+
+    @staticmethod
+    def _average(value):
+        return None if np.isnan(value) else float(value)
+
+    def list_companies(self):
+        companies = self.snapshot.companies
+        return [companies.row(row) for row in range(companies.size)]
+
+    def get_company(self, company_id):
+        row = self._company_row(company_id)
+        return None if row is None else self.snapshot.companies.row(row)
+
+    def list_reviews(self, company_id):
+        reviews = self.snapshot.reviews
+        return [reviews.row(row) for row in reviews.rows_for("company_id", company_id)]
+
+    def list_accomplishments(self, company_id):
+        accomplishments = self.snapshot.accomplishments
+        return [accomplishments.row(row) for row in accomplishments.rows_for("company_id", company_id)]
+
+    def get_user_profile(self, user_id):
+        row = self.snapshot.users.find(user_id)
+        return None if row is None else self.snapshot.users.row(row, exclude=("password",))
+
+    def similar_companies(self, company_id, limit):
+        row = self._company_row(company_id)
+        if row is None:
+            return None
+        snapshot = self.snapshot
+        start = snapshot.similar_offsets[row]
+        end = min(snapshot.similar_offsets[row + 1], start + limit)
+        ids = snapshot.companies.columns["_id"]
+        names = snapshot.companies.columns.get("name")
+        return [
+            {
+                "company_id": ids.get(other),
+                "name": names.get(other) if names else None,
+                "score": round(float(score), 4)
+            }
+            for other, score in zip(snapshot.similar_rows[start:end], snapshot.similar_scores[start:end])
+        ]
+
+    def top_rated_companies(self, limit=5):
+        averages = self.snapshot.average_rating
+        # Companies without reviews sort last, as null does in MongoDB's descending sort
+        order = np.lexsort((-np.nan_to_num(averages, nan=-np.inf), np.isnan(averages)))[:limit]
+        return [self._summary(row, averageRating=self._average(averages[row])) for row in order]
+
+    def average_rating(self, company_id):
+        row = self._company_row(company_id)
+        if row is None or self.snapshot.review_count[row] == 0:
+            return None
+        return {"_id": str(company_id), "averageRating": round(float(self.snapshot.average_rating[row]), 2)}
+
+    def review_counts(self):
+        counts = self.snapshot.review_count
+        order = np.argsort(-counts, kind="stable")
+        return [self._summary(row, reviewCount=int(counts[row])) for row in order]
+
+    def rating_distribution(self, company_id):
+        rows = self.snapshot.reviews.rows_for("company_id", company_id)
+        ratings = self.snapshot.ratings[rows]
+        values, counts = np.unique(ratings[~np.isnan(ratings)], return_counts=True)
+        return [{"_id": float(value), "count": int(count)} for value, count in zip(values, counts)]
+
+    def company_engagement(self):
+        reviews = self.snapshot.review_count
+        accomplishments = self.snapshot.accomplishment_count
+        order = np.lexsort((-accomplishments, -reviews))
+        return [
+            self._summary(row, reviewCount=int(reviews[row]), accomplishmentCount=int(accomplishments[row]))
+            for row in order
+        ]
+
+    def top_accomplishments(self, company_id, limit=5):
+        table = self.snapshot.accomplishments
+        rows = table.rows_for("company_id", company_id)
+        scores = np.nan_to_num(self.snapshot.scores[rows], nan=-np.inf)
+        return [table.row(row) for row in rows[np.argsort(-scores, kind="stable")][:limit]]
+
+    def company_ids_in_industry(self, industry):
+        companies = self.snapshot.companies
+        industries = companies.columns.get("industry")
+        if industries is None:
+            return []
+        return [companies.columns["_id"].get(row) for row in range(companies.size) if industries.get(row) == industry]
+
+    def review_sketches(self, company_ids):
+        snapshot = self.snapshot
+        rows = sorted({row for row in (self._company_row(company_id) for company_id in company_ids) if row is not None})
+        registers = np.zeros(HyperLogLog().size, dtype=np.uint8)
+        for row in rows:
+            start, end = snapshot.register_offsets[row], snapshot.register_offsets[row + 1]
+            np.maximum.at(registers, snapshot.register_index[start:end], snapshot.register_rank[start:end])
+        counts = snapshot.rating_buckets[rows].sum(axis=0) if rows else np.zeros(0, dtype=np.int64)
+        ratings = RatingHistogram(dict(enumerate(counts.tolist())))
+        found = sum(1 for row in rows if snapshot.review_count[row] > 0)
+        return HyperLogLog(dense=registers.tobytes()), ratings, found
+
+    def cube(self, dimensions, filters):
+        from models.company_cube import decade_of
+
+        snapshot = self.snapshot
+        companies = snapshot.companies
+
+        def values(field):
+            column = companies.columns.get(field)
+            return [None] * companies.size if column is None else column.strings()
+
+        dimension_values = {
+            "industry": values("industry"),
+            "location": values("location"),
+            "decade": [decade_of(founded) for founded in values("founded")]
+        }
+        selected = np.ones(companies.size, dtype=bool)
+        for dimension, value in (filters or {}).items():
+            selected &= np.array([item == value for item in dimension_values[dimension]], dtype=bool)
+
+        # Encode each dimension as integer codes and combine them into one group code per company
+        codes = np.zeros(companies.size, dtype=np.int64)
+        labels = []
+        for dimension in dimensions:
+            keys = [json.dumps(item) for item in dimension_values[dimension]]
+            uniques, inverse = np.unique(np.array(keys, dtype=object), return_inverse=True)
+            codes = codes * len(uniques) + inverse
+            labels.append((dimension, uniques))
+        groups, group_of = np.unique(codes[selected], return_inverse=True)
+
+        def total(measure):
+            return np.bincount(group_of, weights=measure[selected], minlength=len(groups))
+
+        company_count = np.bincount(group_of, minlength=len(groups))
+        review_count = total(snapshot.review_count)
+        rating_sum = total(snapshot.rating_sum)
+        accomplishment_count = total(snapshot.accomplishment_count)
+        score_sum = total(snapshot.accomplishment_score_sum)
+
+        rows = []
+        for index, code in enumerate(groups):
+            row = {}
+            for dimension, uniques in reversed(labels):
+                code, position = divmod(int(code), len(uniques))
+                row[dimension] = json.loads(uniques[position])
+            row = {dimension: row[dimension] for dimension in dimensions}
+            row.update({
+                "companyCount": int(company_count[index]),
+                "reviewCount": int(review_count[index]),
+                "averageRating": round(rating_sum[index] / review_count[index], 2) if review_count[index] else None,
+                "accomplishmentCount": int(accomplishment_count[index]),
+                "averageAccomplishmentScore": (
+                    round(score_sum[index] / accomplishment_count[index], 2) if accomplishment_count[index] else None
+                )
+            })
+            rows.append(row)
+        rows.sort(key=lambda row: -row["reviewCount"])
+        return rows
@@ -1,8 +1,8 @@
 from bson import ObjectId
 from functools import wraps
 from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
-from flask import jsonify
-from extensions import mongo
+from flask import current_app, jsonify
+from models.user import user_repository
 
 def format_object_id(document):
     """
@@ -20,6 +20,22 @@ def format_object_id(document):
         return [format_object_id(item) for item in document]
     return document
 
+def apply_derived(update, *args):
+    """
+    Applies a write to derived state (cube, sketches, review summaries) after the primary write succeeded.
+
+    The primary document is already stored, so a failure here is logged instead of failing the request;
+    the rebuild-cube, rebuild-sketches and rebuild-review-metrics commands repair what is left behind.
+
+    Args:
+        update (callable): The derived-state update.
+        *args: Arguments passed to `update`.
+    """
+    try:
+        update(*args)
+    except Exception as e:
+        current_app.logger.error(f"Derived update {update.__module__}.{update.__name__} failed: {str(e)}")
+
 def role_required(required_role):
     """
     Decorator to enforce role-based access control with real-time validation from the database.
@@ -36,8 +52,8 @@ def role_required(required_role):
             verify_jwt_in_request()  # Ensures the request has a valid JWT token
             current_user_id = get_jwt_identity()  # Retrieves the current user's ID from the JWT
             try:
-                # Fetches the user from the database by ID
-                user = mongo.db.users.find_one({"_id": ObjectId(current_user_id)})
+                # Fetches the user by ID; the route gets the same document from the identity map
+                user = user_repository.get(current_user_id)
                 
                 # Checks if the user's role matches the required role
                 if user and user.get("role") == required_role:
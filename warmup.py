@@ -0,0 +1,144 @@
+import os
+import threading
+import time
+from flask import g, request
+from pymongo import ASCENDING, DESCENDING
+from extensions import mongo, review_buffer, company_cache, accomplishment_cache
+
+# Indexes used by the hot read paths, as (collection, keys)
+HOT_INDEXES = [
+    ("reviews", [("company_id", ASCENDING)]),
+    ("reviews", [("user_id", ASCENDING)]),
+    ("reviews", [("created_at", ASCENDING)]),
+    ("accomplishments", [("company_id", ASCENDING), ("achievement_score", DESCENDING)]),
+    ("companies", [("industry", ASCENDING)]),
+    ("users", [("email", ASCENDING)])
+]
+
+
+def ensure_indexes(db):
+    """
+    Creates the indexes of the hot read paths if they do not exist yet.
+
+    Args:
+        db (Database): The database to create the indexes in.
+    """
+    for collection, keys in HOT_INDEXES:
+        db[collection].create_index(keys)
+
+
+def init_worker(app):
+    """
+    Creates the Mongo client of a freshly forked worker and warms it up before it accepts traffic.
+
+    The client built while the application module was imported must not be used after a fork,
+    so every worker replaces it with its own. Warmup opens WARMUP_CONNECTIONS pool connections,
+    reads the hot indexes so their pages are in the server cache, and sends WARMUP_PATHS through
+    the application so Flask's lazy setup does not land on the first real request. With the
+    snapshot backend there is no MongoDB, so only WARMUP_PATHS are sent.
+
+    The worker does not heartbeat while it warms up, so warmup stops after WARMUP_TIMEOUT_MS,
+    which must stay well below gunicorn's worker timeout. When MongoDB does not answer within the
+    budget, the worker skips the rest of the warmup and starts cold instead of being killed and
+    restarted in a loop.
+
+    Args:
+        app (Flask): The application served by the worker.
+
+    Returns:
+        float: The warmup time in seconds.
+    """
+    started = time.monotonic()
+    deadline = started + app.config["WARMUP_TIMEOUT_MS"] / 1000.0
+    company_cache.clear()
+    accomplishment_cache.clear()
+    ready = True
+    if app.config["DATA_BACKEND"] != "snapshot":
+        ready = _warm_mongo(app, deadline)
+
+    if ready:
+        client = app.test_client()
+        for path in app.config["WARMUP_PATHS"]:
+            if time.monotonic() >= deadline:
+                app.logger.warning(f"Warmup budget spent, skipped {path} and later paths")
+                break
+            client.get(path, headers={"X-Warmup": "1"})
+
+    elapsed = time.monotonic() - started
+    app.logger.info(f"Worker {os.getpid()} warmed up in {elapsed * 1000:.1f} ms")
+    return elapsed
+
+
+def _warm_mongo(app, deadline):
+    # Returns False when MongoDB did not answer in time, so the caller skips the rest of the warmup
+    mongo.init_app(app, maxPoolSize=app.config["MONGO_MAX_POOL_SIZE"], minPoolSize=app.config["MONGO_MIN_POOL_SIZE"])
+
+    # Concurrent pings force the pool to open one connection each; daemon threads, so a ping stuck
+    # in server selection is abandoned at the deadline instead of holding up the worker
+    errors = []
+
+    def ping():
+        try:
+            mongo.cx.admin.command("ping")
+        except Exception as e:
+            errors.append(e)
+
+    pings = [threading.Thread(target=ping, daemon=True) for _ in range(max(1, app.config["WARMUP_CONNECTIONS"]))]
+    for thread in pings:
+        thread.start()
+    for thread in pings:
+        thread.join(max(0.0, deadline - time.monotonic()))
+    if any(thread.is_alive() for thread in pings) or errors:
+        reason = str(errors[0]) if errors else "timed out"
+        app.logger.warning(f"Warmup could not reach MongoDB ({reason}), worker starts cold")
+        return False
+
+    limit = app.config["WARMUP_INDEX_TOUCH_LIMIT"]
+    for collection, keys in HOT_INDEXES:
+        remaining_ms = int((deadline - time.monotonic()) * 1000)
+        if remaining_ms <= 0:
+            app.logger.warning(f"Warmup budget spent before index {keys} on {collection}")
+            return False
+        projection = {"_id": 0}
+        projection.update({field: 1 for field, _ in keys})
+        try:
+            # Covered query: walks the index without fetching documents
+            for _ in mongo.db[collection].find({}, projection).hint(keys).limit(limit).max_time_ms(remaining_ms):
+                pass
+        except Exception as e:
+            app.logger.warning(f"Warmup could not read index {keys} on {collection}: {str(e)}")
+    return True
+
+
+def shutdown_worker(app):
+    """
+    Flushes buffered reviews and closes the worker's Mongo client once in-flight requests are done.
+
+    Args:
+        app (Flask): The application served by the worker.
+    """
+    review_buffer.close()
+    mongo.cx.close()
+    app.logger.info(f"Worker {os.getpid()} drained")
+
+
+def instrument_first_request(app):
+    """
+    Logs the latency of the first request each worker process serves, ignoring warmup requests.
+
+    Args:
+        app (Flask): The application to instrument.
+    """
+    state = {"pid": None}
+
+    @app.before_request
+    def start_timer():
+        g.request_started = time.monotonic()
+
+    @app.after_request
+    def log_first_request(response):
+        if state["pid"] != os.getpid() and "request_started" in g and not request.headers.get("X-Warmup"):
+            state["pid"] = os.getpid()
+            elapsed = (time.monotonic() - g.request_started) * 1000
+            app.logger.info(f"Worker {os.getpid()} served its first request {request.path} in {elapsed:.1f} ms")
+        return response
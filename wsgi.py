@@ -0,0 +1,21 @@
+"""
+Production entry point.
+
+Run with gunicorn, which preloads this module in the master process and forks the workers:
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Mongo clients are created per worker after the fork and warmed up before the worker accepts
+traffic (see gunicorn.conf.py and warmup.py).
+"""
+import logging
+from app import app
+from warmup import instrument_first_request
+
+# Route application logs through gunicorn's error log
+gunicorn_logger = logging.getLogger("gunicorn.error")
+if gunicorn_logger.handlers:
+    app.logger.handlers = gunicorn_logger.handlers
+    app.logger.setLevel(gunicorn_logger.level)
+
+instrument_first_request(app)